@@ -4,8 +4,9 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_cors import CORS
 
-from .models import db, User
-from .utils import get_sentiment_pipeline, get_nlp
+from .models import db, User, CompetitorCache
+from .inference import preload_models
+from .utils import run_diagnostics_on_startup
 
 # App factory pattern
 def create_app():
@@ -56,18 +57,28 @@ def create_app():
     with app.app_context():
         try:
             db.create_all()
+            # create_all() skips existing tables, so add indexes introduced since they were created
+            for index in CompetitorCache.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
             print("✅ Database tables created successfully.")
         except Exception as e:
             print("[ERROR] Failed to initialize database tables:", e)
 
-        try:
-            _ = get_sentiment_pipeline()
-        except Exception as e:
-            print("[ERROR] Failed to initialize sentiment model:", e)
+        preload_models()
 
-        try:
-            _ = get_nlp()
-        except Exception as e:
-            print("[ERROR] Failed to load SpaCy NLP model:", e)
+    # ----------------------
+    # Analysis Job Recovery
+    # ----------------------
+    # Requeues jobs whose worker died and, with the thread runner, restarts queued
+    # ones. Started in the process that serves requests, never at import time, so
+    # a preloading gunicorn master doesn't fork with the sweeper thread running.
+    from .jobs import start_job_sweeper
+
+    @app.before_request
+    def ensure_job_sweeper():
+        start_job_sweeper(app)
+
+    if os.getenv("STARTUP_DIAGNOSTICS", "false").lower() == "true":
+        run_diagnostics_on_startup()
 
     return app
@@ -0,0 +1,721 @@
+import os
+import json
+import math
+import time
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, ReviewHistory, SentimentSnapshot, ProductAnalysis, ProductReview
+from .competitor_cache import lookup_gpt_competitors
+from .competitor_matcher import count_competitor_mentions, get_competitor_matcher
+from .feature_cache import load_cached_features, store_features
+from .inference import iter_cascade_batches, iter_sentiment_batches
+from .oxylabs_client import get_oxylabs_client
+from .sentiment_cache import load_cached_sentiments, store_sentiments
+from .singleflight import coalesced
+from .utils import (
+    SENTIMENT_CASCADE,
+    SENTIMENT_MODEL_ID,
+    extract_review_features,
+    get_nlp,
+    nlp_features_id,
+    compute_review_hashes_and_filter,
+    review_content_hash
+)
+
+OXYLABS_FAN_OUT = int(os.getenv("OXYLABS_FAN_OUT", 8))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 8))
+REVIEWS_PER_PAGE = 5
+# Texts per sentiment + spaCy pass in the /api/analyze stream
+ANALYZE_CHUNK_SIZE = int(os.getenv("ANALYZE_CHUNK_SIZE", 256))
+# Incremental mode stops paging once this share of a page is already analyzed
+INCREMENTAL_KNOWN_RATIO = float(os.getenv("INCREMENTAL_KNOWN_RATIO", 0.8))
+# How long an analysis waits for GPT competitors before saving without them
+GPT_DEADLINE = float(os.getenv("GPT_DEADLINE", 3))
+# Threads for GPT competitor lookups and late fills, kept off the pipeline pool
+GPT_WORKERS = int(os.getenv("GPT_WORKERS", 4))
+# How long a shared per-ASIN analysis is served to every user before it is refreshed
+SHARED_ANALYSIS_TTL = float(os.getenv("SHARED_ANALYSIS_TTL", 6 * 3600))
+# Analyses that came back short of the requested count may have hit a transient
+# empty page rather than the product's real end, so they are re-scraped sooner
+SHARED_EXHAUSTED_TTL = float(os.getenv("SHARED_EXHAUSTED_TTL", 15 * 60))
+LABEL_MAPPING = {
+    "LABEL_0": "VERY NEGATIVE", "LABEL_1": "NEGATIVE", "LABEL_2": "NEUTRAL",
+    "LABEL_3": "POSITIVE", "LABEL_4": "VERY POSITIVE",
+    "NEGATIVE": "NEGATIVE", "POSITIVE": "POSITIVE", "NEUTRAL": "NEUTRAL"
+}
+
+# Shared pool for request-side work that can overlap scraping and inference
+_pipeline_pool = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline")
+# GPT calls can block for the whole OpenAI timeout; a pool of their own keeps
+# them from queueing spaCy and feature extraction behind them
+_gpt_pool = ThreadPoolExecutor(max_workers=GPT_WORKERS, thread_name_prefix="gpt")
+
+
+def snapshot_to_dict(snapshot, total_reviews_scraped=None):
+    return {
+        "asin": snapshot.asin,
+        "product_name": snapshot.product_name,
+        "manufacturer": snapshot.manufacturer,
+        "price": snapshot.price,
+        "median_score": snapshot.median_score,
+        "top_adjectives": json.loads(snapshot.top_adjectives or "[]"),
+        "competitor_mentions": json.loads(snapshot.competitor_mentions or "{}"),
+        "gpt_competitors": json.loads(snapshot.gpt_competitors or "[]"),
+        "review_dates": json.loads(snapshot.review_dates or "[]"),
+        "positive_scores": json.loads(snapshot.positive_scores or "[]"),
+        "negative_scores": json.loads(snapshot.negative_scores or "[]"),
+        "neutral_scores": json.loads(snapshot.neutral_scores or "[]"),
+        "positive_percentage": snapshot.positive_percentage,
+        "negative_percentage": snapshot.negative_percentage,
+        "neutral_percentage": snapshot.neutral_percentage,
+        "country_sentiment": json.loads(snapshot.country_sentiment or "{}"),
+        "top_helpful_reviews": json.loads(snapshot.top_helpful_reviews or "[]"),
+        "total_reviews_scraped": total_reviews_scraped
+    }
+
+# ---------------------
+# Review Page Fetching
+# ---------------------
+def fetch_review_page(asin, page, sort_by="recent"):
+    return get_oxylabs_client().get_review_page(asin, page, sort_by=sort_by).reviews
+
+def iter_review_pages(asin, count, sort_by="recent", fan_out=None, known_hashes=None):
+    """Yield `(page, new_reviews)` in page order with at most `fan_out` pages in flight.
+
+    Paging stops at the first empty page or once `count` reviews are collected.
+    Reviews repeated across pages are dropped.
+
+    With `known_hashes` (incremental mode) paging also stops after the first
+    page that is mostly already analyzed; the window starts at one page and
+    doubles per new page so a refresh doesn't speculatively fetch the full fan-out.
+    """
+    pages = math.ceil(count / REVIEWS_PER_PAGE)
+    fan_out = max(1, min(fan_out or OXYLABS_FAN_OUT, pages))
+    window = 1 if known_hashes else fan_out
+    print(f"🔎 Need to fetch {count} reviews -> Estimating {pages} pages (fan-out {fan_out})...")
+
+    collected = 0
+    seen = set()
+    pool = ThreadPoolExecutor(max_workers=fan_out)
+    in_flight = {}
+    next_page = 1
+    try:
+        for page in range(1, pages + 1):
+            while next_page <= pages and len(in_flight) < window:
+                in_flight[next_page] = pool.submit(fetch_review_page, asin, next_page, sort_by)
+                next_page += 1
+
+            page_reviews = in_flight.pop(page).result()
+            print(f"[DEBUG] Page {page} fetched {len(page_reviews)} reviews.")
+            if not page_reviews:
+                break
+
+            new_reviews = []
+            for r in page_reviews:
+                key = r.get("id") or r.get("content", "").strip()
+                if key in seen:
+                    continue
+                seen.add(key)
+                new_reviews.append(r)
+            collected += len(new_reviews)
+            yield page, new_reviews
+            if collected >= count:
+                break
+
+            if known_hashes:
+                known = sum(review_content_hash(r.get("content", "")) in known_hashes for r in page_reviews)
+                if known / len(page_reviews) >= INCREMENTAL_KNOWN_RATIO:
+                    print(f"[DEBUG] Page {page} is {known}/{len(page_reviews)} known, stopping incremental fetch.")
+                    break
+                window = min(fan_out, window * 2)
+    finally:
+        # Don't hold the request on pages we no longer need
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# ---------------------
+# Shared Per-ASIN Store
+# ---------------------
+def load_known_hashes(asin):
+    return {h for (h,) in db.session.query(ProductReview.content_hash).filter_by(asin=asin)}
+
+def get_shared_analysis(asin, sort_by="recent"):
+    return ProductAnalysis.query.filter_by(asin=asin, sort_by=sort_by).first()
+
+def covers(shared, count):
+    """True when `shared` holds enough reviews to serve a `count`-review view."""
+    return shared is not None and (shared.review_count >= count or shared.exhausted)
+
+def is_fresh(shared, count):
+    if not covers(shared, count):
+        return False
+    ttl = SHARED_EXHAUSTED_TTL if shared.review_count < count else SHARED_ANALYSIS_TTL
+    return time.time() - shared.updated_at < ttl
+
+def _apply_shared_analysis(asin, count, sort_by, analysis, incremental):
+    known = load_known_hashes(asin)
+    new_rows = []
+    for r in analysis["reviews"]:
+        content_hash = review_content_hash(r["content"])
+        if content_hash in known:
+            continue
+        known.add(content_hash)
+        new_rows.append(ProductReview(
+            asin=asin,
+            content_hash=content_hash,
+            title=r["title"],
+            content=r["content"],
+            helpful_count=r["helpful_count"],
+            country=r["country"],
+            review_date=r["date"],
+            label=r["label"],
+            score=r["score"]
+        ))
+    db.session.add_all(new_rows)
+
+    shared = get_shared_analysis(asin, sort_by)
+    if shared is None:
+        shared = ProductAnalysis(asin=asin, sort_by=sort_by, review_count=0, exhausted=False)
+        db.session.add(shared)
+
+    product = analysis["product"]
+    if product:
+        shared.product_name = product["product_name"]
+        shared.manufacturer = product["manufacturer"]
+        shared.price = product["price"]
+        # A late lookup fills these in itself; don't overwrite names it may already have stored
+        if not product.get("gpt_pending"):
+            shared.gpt_competitors = json.dumps(product["gpt_competitors"])
+
+    adjectives = Counter(analysis["adjectives"])
+    mentions = Counter(analysis["competitor_mentions"])
+    if incremental:
+        adjectives.update(json.loads(shared.adjective_counts or "{}"))
+        mentions.update(json.loads(shared.competitor_counts or "{}"))
+        shared.review_count += len(new_rows)
+    else:
+        shared.review_count = len(analysis["reviews"])
+        shared.exhausted = analysis["total_reviews_scraped"] < count
+
+    shared.adjective_counts = json.dumps(dict(adjectives))
+    shared.competitor_counts = json.dumps(dict(mentions))
+    shared.updated_at = time.time()
+    return len(new_rows)
+
+def store_shared_analysis(asin, count, sort_by, analysis, incremental=False):
+    """Save `analysis` into the per-ASIN store; returns how many reviews were new.
+
+    A scrape that got no review pages, or a full one that produced no reviews or
+    product metadata, is most likely a transient Oxylabs failure and is not
+    stored, so it can't be served to every user as the product's result. An
+    incremental run that only found known reviews still marks the store fresh.
+    """
+    if not analysis["total_reviews_scraped"] or (not incremental and not analysis["product"]):
+        print(f"[WARNING] Not storing the analysis of {asin}: no reviews or product data came back.")
+        return 0
+    try:
+        stored = _apply_shared_analysis(asin, count, sort_by, analysis, incremental)
+        db.session.commit()
+    except IntegrityError:
+        # A run for another count of the same ASIN stored some rows first
+        db.session.rollback()
+        stored = _apply_shared_analysis(asin, count, sort_by, analysis, incremental)
+        db.session.commit()
+    print(f"📦 Stored {stored} new reviews for {asin} in the shared analysis.")
+    return stored
+
+def load_shared_reviews(asin, count, seen_by=None):
+    """The `count` most recent stored reviews for `asin`, undated ones last.
+
+    With `seen_by`, only reviews stored by then count, which rebuilds the
+    review set of a snapshot saved at that time.
+    """
+    query = ProductReview.query.filter_by(asin=asin)
+    if seen_by is not None:
+        query = query.filter(ProductReview.first_seen <= seen_by)
+    rows = query.all()
+    rows.sort(key=lambda r: (r.review_date != "Unknown", r.review_date or "", r.id), reverse=True)
+    return rows[:count]
+
+# ---------------------
+# Product Metadata + GPT Competitors
+# ---------------------
+def _lookup_gpt_competitors_timed(app, product_name, manufacturer, timings):
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            return lookup_gpt_competitors(app, product_name, manufacturer)
+        finally:
+            timings["gpt"] = time.perf_counter() - started
+
+def fetch_product_and_competitors(app, asin, timings=None):
+    """Product metadata, then start the GPT competitor lookup that depends on it.
+
+    Runs on the pipeline pool and starts the lookup on the GPT pool, so neither
+    call sits on the review path. Returns `(product_name, manufacturer, price,
+    gpt_future, gpt_deadline)`; wait on the future with `await_gpt_competitors`.
+    Stage durations are recorded into `timings` as `product` and `gpt`.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    product = get_oxylabs_client().get_product(asin)
+    product_name = product.title or "Unknown"
+    manufacturer = product.manufacturer or "Unknown"
+    price = product.price or 0.0
+    timings["product"] = time.perf_counter() - started
+
+    gpt_deadline = time.monotonic() + GPT_DEADLINE
+    gpt_future = _gpt_pool.submit(_lookup_gpt_competitors_timed, app, product_name, manufacturer, timings)
+    return product_name, manufacturer, price, gpt_future, gpt_deadline
+
+def await_gpt_competitors(gpt_future, gpt_deadline):
+    """`(gpt_competitors, pending)`: the names if the lookup beat its deadline, else `([], True)`.
+
+    A late lookup keeps running and fills `CompetitorCache` when it returns.
+    """
+    try:
+        return gpt_future.result(timeout=max(0.0, gpt_deadline - time.monotonic())), False
+    except FutureTimeoutError:
+        print(f"⏳ GPT competitors missed the {GPT_DEADLINE}s deadline; they will be filled in when the lookup returns.")
+        return [], True
+
+def fill_late_competitors(app, asin, product_name, manufacturer, after_snapshot_id):
+    """Wait for a GPT lookup that missed its deadline, then patch the stored results.
+
+    Joins the in-flight lookup through `lookup_gpt_competitors` and updates the
+    shared analysis, with mentions recounted over every stored review, and each
+    snapshot of `asin` saved without GPT competitors since `after_snapshot_id`,
+    with mentions recounted over the reviews that snapshot covers.
+    """
+    with app.app_context():
+        try:
+            names = lookup_gpt_competitors(app, product_name, manufacturer)
+            if not names:
+                return
+            reviews = [content for (content,) in db.session.query(ProductReview.content).filter_by(asin=asin)]
+            counts = count_competitors(reviews, product_name, manufacturer, names)
+
+            for shared in ProductAnalysis.query.filter_by(asin=asin):
+                shared.gpt_competitors = json.dumps(names)
+                shared.competitor_counts = json.dumps(counts)
+            snapshots = SentimentSnapshot.query.filter(
+                SentimentSnapshot.asin == asin,
+                SentimentSnapshot.id > after_snapshot_id,
+                SentimentSnapshot.gpt_competitors == "[]"
+            ).all()
+            for snapshot in snapshots:
+                covered = load_shared_reviews(asin, len(json.loads(snapshot.review_dates or "[]")), snapshot.timestamp)
+                snapshot.gpt_competitors = json.dumps(names)
+                snapshot.competitor_mentions = json.dumps(
+                    count_competitors([r.content for r in covered], product_name, manufacturer, names)
+                )
+            db.session.commit()
+            print(f"✅ Late GPT competitors for {asin} patched into {len(snapshots)} snapshot(s).")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERROR] Late competitor fill for {asin} failed: {e}")
+
+# ---------------------
+# NLP Extraction
+# ---------------------
+def review_features(texts, entities=False):
+    """Per-text `(adjectives, orgs)` lists: cached ones as stored, the misses parsed and stored.
+
+    Only new reviews are parsed, so counts for a growing review set are merged
+    from stored per-review lists. `orgs` may be None unless `entities`.
+    Must run inside an app context.
+    """
+    nlp = get_nlp()
+    nlp_id = nlp_features_id(nlp)
+    hashes = [review_content_hash(text) for text in texts]
+    features = load_cached_features(hashes, nlp_id, entities)
+    misses = [i for i, h in enumerate(hashes) if h not in features]
+    print(f"📦 Feature cache: {len(texts) - len(misses)} hits, {len(misses)} misses.")
+
+    if misses:
+        miss_texts = [texts[i] for i in misses]
+        # In-process: forking spaCy workers from a threaded web worker costs more
+        # than it saves at request sizes (see devtools/bench_spacy.py)
+        parsed = extract_review_features(miss_texts, nlp, n_process=1, entities=entities)
+        new = {hashes[i]: f for i, f in zip(misses, parsed)}
+        store_features(new, nlp_id, entities)
+        features.update(new)
+    return [features[h] for h in hashes]
+
+def merge_adjective_counts(features):
+    adjectives = Counter()
+    for review_adjectives, _ in features:
+        adjectives.update(review_adjectives)
+    return adjectives
+
+def count_adjectives_timed(app, reviews, timings):
+    """Adjective counts over `reviews` on the pipeline pool, timed as `spacy`."""
+    print("🔍 Extracting adjectives...")
+    started = time.perf_counter()
+    try:
+        with app.app_context():
+            return dict(merge_adjective_counts(review_features(reviews)))
+    except Exception as e:
+        print(f"[ERROR] SpaCy processing failed: {e}")
+        return {}
+    finally:
+        timings["spacy"] = time.perf_counter() - started
+
+def count_competitors(reviews, product_name, manufacturer, gpt_competitors):
+    """Mentions of the gazetteer brands in `reviews`, with the matcher cached per product."""
+    nlp = get_nlp()
+    matcher = get_competitor_matcher(nlp, (product_name, manufacturer), gpt_competitors)
+    return count_competitor_mentions(reviews, matcher, nlp)
+
+# ---------------------
+# Sentiment Scoring
+# ---------------------
+def score_sentiments(texts, cascade_stats=None):
+    """Yield `(indices, results)` for `texts`: cached results first, then inference batches of the misses.
+
+    Misses run in length-bucketed batches (through the cascade when enabled) and
+    are stored per batch, so a cancelled run still keeps what it scored.
+    Must run inside an app context.
+    """
+    hashes = [review_content_hash(text) for text in texts]
+    cached = load_cached_sentiments(hashes, SENTIMENT_MODEL_ID)
+    hits = [i for i, h in enumerate(hashes) if h in cached]
+    misses = [i for i, h in enumerate(hashes) if h not in cached]
+    print(f"📦 Sentiment cache: {len(hits)} hits, {len(misses)} misses.")
+    if hits:
+        yield hits, [cached[hashes[i]] for i in hits]
+
+    miss_texts = [texts[i] for i in misses]
+    if SENTIMENT_CASCADE:
+        batches = iter_cascade_batches(miss_texts, stats=cascade_stats)
+    else:
+        batches = iter_sentiment_batches(miss_texts)
+    for indices, batch in batches:
+        indices = [misses[i] for i in indices]
+        store_sentiments({hashes[i]: s for i, s in zip(indices, batch)}, SENTIMENT_MODEL_ID)
+        yield indices, batch
+
+# ---------------------
+# Analysis Pipeline
+# ---------------------
+def compute_analysis(app, asin, count, sort_by="recent", known_hashes=None):
+    """User-independent half of the pipeline: scrape, run inference and extract.
+
+    Yields `pages` and `sentiment` progress events, then one `analysis` event whose
+    JSON-serializable `data` holds per-review results, NER counts and product info.
+    With `known_hashes` this is an incremental run that skips already analyzed reviews.
+    Must run inside an app context.
+    """
+    started = time.perf_counter()
+    # Written by the pool threads; each stage only sets its own keys
+    timings = {}
+    product_future = _pipeline_pool.submit(fetch_product_and_competitors, app, asin, timings)
+
+    all_reviews = []
+    for page, page_reviews in iter_review_pages(asin, count, sort_by=sort_by, known_hashes=known_hashes):
+        all_reviews.extend(page_reviews)
+        yield {"event": "pages", "page": page, "reviews_fetched": len(all_reviews), "target": count}
+    timings["fetch"] = time.perf_counter() - started
+
+    print(f"[DEBUG] Total reviews collected: {len(all_reviews)}")
+
+    reviews, review_dates, _, review_meta = compute_review_hashes_and_filter(
+        all_reviews, None, skip_hashes=known_hashes
+    )
+
+    # Trim if needed
+    reviews = reviews[:count]
+    review_dates = review_dates[:count]
+    review_meta = review_meta[:count]
+
+    analysis = {
+        "reviews": [],
+        "adjectives": {},
+        "competitor_mentions": {},
+        "product": None,
+        "total_reviews_scraped": len(all_reviews)
+    }
+    if not reviews:
+        yield {"event": "analysis", "data": analysis}
+        return
+
+    # NLP Analysis: spaCy adjectives run on the pool while sentiment runs here, alongside the GPT lookup
+    adjectives_future = _pipeline_pool.submit(count_adjectives_timed, app, reviews, timings)
+
+    sentiment_started = time.perf_counter()
+    sentiments = [None] * len(reviews)
+    running = {"POSITIVE": 0, "NEGATIVE": 0, "NEUTRAL": 0}
+    cascade_stats = {}
+    processed = 0
+    for indices, batch in score_sentiments(reviews, cascade_stats):
+        for i, s in zip(indices, batch):
+            sentiments[i] = s
+            label = LABEL_MAPPING.get(s["label"].upper(), "NEUTRAL")
+            running[label if label in running else "NEUTRAL"] += 1
+        processed += len(batch)
+        yield {"event": "sentiment", "processed": processed, "total": len(reviews), "counts": dict(running)}
+    timings["sentiment"] = time.perf_counter() - sentiment_started
+
+    if cascade_stats.get("total"):
+        print(f"🪜 Cascade escalated {cascade_stats['escalated']}/{cascade_stats['total']} reviews "
+              f"below {cascade_stats['threshold']} to the main model.")
+        yield dict(cascade_stats, event="cascade")
+
+    adjectives = adjectives_future.result()
+
+    # GPT competitors (started alongside review fetching), waited on only until GPT_DEADLINE
+    product_name, manufacturer, price, gpt_future, gpt_deadline = product_future.result()
+    gpt_competitors, gpt_pending = await_gpt_competitors(gpt_future, gpt_deadline)
+
+    matching_started = time.perf_counter()
+    competitor_mentions = count_competitors(reviews, product_name, manufacturer, gpt_competitors)
+    timings["competitors"] = time.perf_counter() - matching_started
+
+    stages = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+    total = round(time.perf_counter() - started, 3)
+    print(f"⏱️ Stage timings for {asin}: {stages} (total {total}s)")
+    yield {"event": "timings", "stages": stages, "total_seconds": total}
+
+    analysis.update(
+        reviews=[
+            dict(meta, date=date, label=LABEL_MAPPING.get(s["label"].upper(), "NEUTRAL"), score=s["score"] * 10)
+            for meta, date, s in zip(review_meta, review_dates, sentiments)
+        ],
+        adjectives=adjectives,
+        competitor_mentions=competitor_mentions,
+        product={
+            "product_name": product_name,
+            "manufacturer": manufacturer,
+            "price": price,
+            "gpt_competitors": gpt_competitors,
+            "gpt_pending": gpt_pending
+        }
+    )
+    yield {"event": "analysis", "data": analysis}
+
+def refresh_shared_analysis(app, asin, count, sort_by="recent", incremental=False):
+    """Run `compute_analysis` and save its result into the per-ASIN store.
+
+    Yields the same progress events; the final `analysis` event only carries
+    counts since the results themselves now live in the database.
+    """
+    known_hashes = load_known_hashes(asin) if incremental else None
+    last_snapshot_id = db.session.query(func.max(SentimentSnapshot.id)).scalar() or 0
+    for event in compute_analysis(app, asin, count, sort_by, known_hashes=known_hashes):
+        if event["event"] != "analysis":
+            yield event
+            continue
+        analysis = event["data"]
+        stored = store_shared_analysis(asin, count, sort_by, analysis, incremental)
+        product = analysis["product"]
+        if product and product["gpt_pending"]:
+            _gpt_pool.submit(
+                fill_late_competitors, app, asin, product["product_name"], product["manufacturer"], last_snapshot_id
+            )
+        yield {"event": "analysis", "data": {
+            "reviews_stored": stored,
+            "total_reviews_scraped": analysis["total_reviews_scraped"]
+        }}
+
+def snapshot_adjectives(shared, records):
+    """Top 10 adjectives over exactly `records`, merged from the per-review feature cache.
+
+    Falls back to the shared per-ASIN counts when some reviews were parsed by
+    another spaCy model.
+    """
+    hashes = [r.content_hash for r in records]
+    cached = load_cached_features(hashes, nlp_features_id())
+    if all(h in cached for h in hashes):
+        return merge_adjective_counts(cached[h] for h in hashes).most_common(10)
+    return Counter(json.loads(shared.adjective_counts or "{}")).most_common(10)
+
+def persist_snapshot(user_id, asin, count, sort_by="recent", total_reviews_scraped=None):
+    """Per-user view over the shared store: save a SentimentSnapshot of the latest `count` reviews.
+
+    Returns the final `snapshot` or `message` event.
+    """
+    # The refresh committed on the coalesced leader's session; drop any copy of the
+    # shared row this session loaded before it, or the snapshot gets the old values
+    db.session.expire_all()
+    shared = get_shared_analysis(asin, sort_by)
+    records = load_shared_reviews(asin, count) if shared else []
+    if total_reviews_scraped is None:
+        total_reviews_scraped = len(records)
+
+    if not records:
+        existing = SentimentSnapshot.query.filter_by(
+            user_id=user_id, asin=asin
+        ).order_by(SentimentSnapshot.timestamp.desc()).first()
+        if existing:
+            return {"event": "snapshot", "data": snapshot_to_dict(existing, total_reviews_scraped=total_reviews_scraped)}
+        return {"event": "message", "data": {"message": "No new reviews."}}
+
+    adjectives = snapshot_adjectives(shared, records)
+    gpt_competitors = json.loads(shared.gpt_competitors or "[]")
+    # Over the same `count` reviews as the adjectives and percentages, not the whole shared store
+    competitor_mentions = count_competitors(
+        [r.content for r in records], shared.product_name, shared.manufacturer, gpt_competitors
+    )
+
+    # Sentiment aggregation
+    pos, neg, neu = [], [], []
+    country_sent = defaultdict(lambda: {"positive": 0, "negative": 0})
+    review_dates, review_meta = [], []
+
+    for r in records:
+        if r.label == "POSITIVE":
+            pos.append(r.score)
+            country_sent[r.country]["positive"] += 1
+        elif r.label == "NEGATIVE":
+            neg.append(r.score)
+            country_sent[r.country]["negative"] += 1
+        else:
+            neu.append(r.score)
+        review_dates.append(r.review_date)
+        review_meta.append({
+            "title": r.title,
+            "content": r.content,
+            "helpful_count": r.helpful_count,
+            "country": r.country
+        })
+
+    all_scores = pos + neg + neu
+    median = round(np.median([x for x in all_scores if x > 0]), 2)
+    total = len(all_scores) or 1
+    pos_pct = round((len(pos) / total) * 100, 2)
+    neg_pct = round((len(neg) / total) * 100, 2)
+    neu_pct = round((len(neu) / total) * 100, 2)
+
+    review_dates_sorted = sorted(review_dates, key=lambda x: (x != "Unknown", x))
+    top_helpful = sorted(review_meta, key=lambda x: x.get("helpful_count", 0), reverse=True)[:3]
+
+    snapshot = SentimentSnapshot(
+        asin=asin,
+        user_id=user_id,
+        product_name=shared.product_name,
+        manufacturer=shared.manufacturer,
+        price=shared.price,
+        median_score=median,
+        top_adjectives=json.dumps(adjectives),
+        competitor_mentions=json.dumps(competitor_mentions),
+        gpt_competitors=json.dumps(gpt_competitors),
+        review_dates=json.dumps(review_dates_sorted),
+        positive_scores=json.dumps(pos),
+        negative_scores=json.dumps(neg),
+        neutral_scores=json.dumps(neu),
+        positive_percentage=pos_pct,
+        negative_percentage=neg_pct,
+        neutral_percentage=neu_pct,
+        country_sentiment=json.dumps(country_sent),
+        top_helpful_reviews=json.dumps(top_helpful)
+    )
+
+    db.session.add(ReviewHistory(asin=asin, user_id=user_id))
+    db.session.add(snapshot)
+    db.session.commit()
+
+    return {"event": "snapshot", "data": snapshot_to_dict(snapshot, total_reviews_scraped=total_reviews_scraped)}
+
+def analyze_reviews(app, user_id, asin, count, incremental=False, sort_by="recent"):
+    """Scrape, analyze and snapshot reviews for `asin`, yielding progress events.
+
+    Yields `pages` events as review pages arrive, `sentiment` events with running
+    label counts after each inference chunk, and finally either a `snapshot`
+    event carrying the serialized snapshot or a `message` event.
+    Results are stored once per ASIN and shared by every user: while the shared
+    analysis is fresh (`SHARED_ANALYSIS_TTL`) a request only builds its snapshot
+    from it, and concurrent refreshes of the same ASIN share one pipeline.
+    Must run inside an app context.
+    """
+    shared = get_shared_analysis(asin, sort_by)
+    total_reviews_scraped = None
+
+    if is_fresh(shared, count):
+        print(f"📦 Serving {asin} from the shared analysis ({shared.review_count} reviews).")
+        yield {"event": "shared", "reviews": shared.review_count, "age": round(time.time() - shared.updated_at, 1)}
+    else:
+        # Only stop paging early when the store already covers the requested count
+        incremental = incremental and covers(shared, count)
+        mode = "incremental" if incremental else "full"
+        events = coalesced(
+            app, f"{asin}:{count}:{sort_by}:{mode}",
+            lambda: refresh_shared_analysis(app, asin, count, sort_by, incremental)
+        )
+        for event in events:
+            if event["event"] == "analysis":
+                total_reviews_scraped = event["data"]["total_reviews_scraped"]
+            else:
+                yield event
+
+    yield persist_snapshot(user_id, asin, count, sort_by, total_reviews_scraped)
+
+def run_analysis(app, user_id, asin, count, incremental=False, sort_by="recent"):
+    """Run `analyze_reviews` to completion and return its final event."""
+    final = None
+    for event in analyze_reviews(app, user_id, asin, count, incremental, sort_by):
+        if event["event"] in ("snapshot", "message"):
+            final = event
+    return final
+
+# ---------------------
+# Batch Text Analysis
+# ---------------------
+def analyze_texts(items, chunk_size=None):
+    """Per-text sentiment, adjectives and ORG entities, independent of any ASIN.
+
+    `items` is an iterable of strings or `{"text", "id"}` objects and may be
+    lazy (e.g. an NDJSON request body). Yields one result dict per item, in
+    input order, `chunk_size` items at a time. Must run inside an app context.
+    """
+    chunk_size = chunk_size or ANALYZE_CHUNK_SIZE
+    chunk = []
+    for index, item in enumerate(items):
+        chunk.append((index, item))
+        if len(chunk) >= chunk_size:
+            yield from _analyze_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from _analyze_chunk(chunk)
+
+def _review_features_in_context(app, texts):
+    with app.app_context():
+        return review_features(texts, entities=True)
+
+def _analyze_chunk(chunk):
+    results = {}
+    valid = []
+    for index, item in chunk:
+        text, item_id = (item.get("text"), item.get("id")) if isinstance(item, dict) else (item, None)
+        result = {"index": index}
+        if item_id is not None:
+            result["id"] = item_id
+        if isinstance(text, str) and text.strip():
+            valid.append((result, text.strip()))
+        else:
+            result["error"] = "Expected a non-empty string or an object with a non-empty text"
+        results[index] = result
+
+    texts = [text for _, text in valid]
+    app = current_app._get_current_object()
+    features_future = _pipeline_pool.submit(_review_features_in_context, app, texts)
+    sentiments = [None] * len(texts)
+    for indices, batch in score_sentiments(texts):
+        for i, s in zip(indices, batch):
+            sentiments[i] = s
+
+    for (result, _), s, (adjectives, orgs) in zip(valid, sentiments, features_future.result()):
+        result.update(
+            label=LABEL_MAPPING.get(s["label"].upper(), "NEUTRAL"),
+            score=round(s["score"], 4),
+            adjectives=adjectives,
+            orgs=orgs
+        )
+
+    for index, _ in chunk:
+        yield results[index]
+
@@ -0,0 +1,270 @@
+"""GPT competitor names per (product_name, manufacturer).
+
+Lookups go through a per-process LRU, then the indexed `competitor_cache`
+table, and only then to GPT. Concurrent misses for the same product share one
+GPT call across threads and workers (`coalesced`), and entries older than
+`COMPETITOR_CACHE_TTL` are refetched, keeping the old names if GPT fails.
+
+Catalog backfills pack many products into each GPT call:
+
+    python -m app.competitor_cache catalog.json --batch-size 20 --concurrency 4
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+from sqlalchemy.sql import func
+
+from .models import db, CompetitorCache, query_in_chunks
+from .singleflight import coalesced
+from .utils import fetch_competitor_names, fetch_competitor_names_bulk, get_openai_client
+
+COMPETITOR_CACHE_TTL = float(os.getenv("COMPETITOR_CACHE_TTL", 30 * 24 * 3600))
+COMPETITOR_LRU_SIZE = int(os.getenv("COMPETITOR_LRU_SIZE", 1024))
+# Bulk discovery: products per chat completion, calls in flight, retries after a 429/5xx
+GPT_BULK_BATCH = int(os.getenv("GPT_BULK_BATCH", 20))
+GPT_BULK_CONCURRENCY = int(os.getenv("GPT_BULK_CONCURRENCY", 4))
+GPT_BULK_MAX_RETRIES = int(os.getenv("GPT_BULK_MAX_RETRIES", 5))
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _lru_get(key):
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        names, fetched_at = entry
+        if time.time() - fetched_at >= COMPETITOR_CACHE_TTL:
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return names
+
+def _lru_put(key, names, fetched_at):
+    with _lru_lock:
+        _lru[key] = (names, fetched_at)
+        _lru.move_to_end(key)
+        while len(_lru) > COMPETITOR_LRU_SIZE:
+            _lru.popitem(last=False)
+
+def _age_seconds(row):
+    created_at = row.created_at
+    if created_at is None:
+        return 0.0
+    # SQLite hands back naive UTC timestamps
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - created_at).total_seconds()
+
+def _load_row(product_name, manufacturer):
+    return CompetitorCache.query.filter_by(
+        product_name=product_name, manufacturer=manufacturer
+    ).order_by(CompetitorCache.created_at.desc()).first()
+
+# ---------------------
+# Miss Path (one per product across threads and workers)
+# ---------------------
+def _fetch_and_store(product_name, manufacturer):
+    """Event generator for `coalesced`: one GPT call, then an upsert of the cache row."""
+    # Another worker may have stored it between our miss and winning the election
+    row = _load_row(product_name, manufacturer)
+    if row is not None and _age_seconds(row) < COMPETITOR_CACHE_TTL:
+        names = json.loads(row.names)
+    else:
+        names = fetch_competitor_names(product_name, manufacturer)
+        if names:
+            if row is None:
+                db.session.add(CompetitorCache(
+                    product_name=product_name,
+                    manufacturer=manufacturer,
+                    names=json.dumps(names)
+                ))
+            else:
+                row.names = json.dumps(names)
+                # created_at doubles as the fetch time the TTL is measured from
+                row.created_at = func.now()
+            db.session.commit()
+        elif row is not None:
+            print(f"[WARNING] GPT refresh failed for {product_name}, keeping expired competitors.")
+            names = json.loads(row.names)
+    yield {"event": "analysis", "data": names}
+
+def lookup_gpt_competitors(app, product_name, manufacturer):
+    """Cached GPT competitor names for a product. Must run inside an app context."""
+    key = (product_name, manufacturer)
+    names = _lru_get(key)
+    if names is not None:
+        return names
+
+    row = _load_row(product_name, manufacturer)
+    if row is not None:
+        age = _age_seconds(row)
+        if age < COMPETITOR_CACHE_TTL:
+            names = json.loads(row.names)
+            _lru_put(key, names, time.time() - age)
+            return names
+
+    flight_key = "gpt:" + hashlib.sha256(f"{product_name}\n{manufacturer}".encode("utf-8")).hexdigest()
+    names = []
+    for event in coalesced(app, flight_key, lambda: _fetch_and_store(product_name, manufacturer)):
+        if event["event"] == "analysis":
+            names = event["data"]
+    if names:
+        _lru_put(key, names, time.time())
+    return names
+
+# ---------------------
+# Bulk Discovery (catalog backfills)
+# ---------------------
+class _RateLimitGate:
+    """Pause shared by every bulk worker once the API answers with a rate limit."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+def _retry_after(error, attempt):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return min(60.0, 2.0 ** attempt)
+
+def _discover_chunk(client, chunk, gate):
+    for attempt in range(GPT_BULK_MAX_RETRIES + 1):
+        gate.wait()
+        try:
+            return fetch_competitor_names_bulk(chunk, client)
+        except RateLimitError as e:
+            delay = _retry_after(e, attempt)
+            print(f"[WARNING] Rate limited on a bulk competitor call; pausing all workers for {delay:.1f}s.")
+            gate.pause(delay)
+        except (InternalServerError, APIConnectionError) as e:
+            print(f"[WARNING] Bulk competitor call failed ({e.__class__.__name__}), retrying.")
+            time.sleep(min(60.0, 2.0 ** attempt))
+    print(f"[ERROR] Gave up on {len(chunk)} products after {GPT_BULK_MAX_RETRIES} retries.")
+    return [[] for _ in chunk]
+
+def _load_rows(keys):
+    """Newest cache row per `(product_name, manufacturer)` in `keys`."""
+    wanted = set(keys)
+    # Every row of a product lands in the same chunk, so the newest one is seen last
+    query = CompetitorCache.query.order_by(CompetitorCache.created_at)
+    rows = {}
+    for row in query_in_chunks(query, CompetitorCache.product_name, [product_name for product_name, _ in keys]):
+        key = (row.product_name, row.manufacturer)
+        if key in wanted:
+            rows[key] = row
+    return rows
+
+def bulk_lookup_gpt_competitors(products, batch_size=None, concurrency=None, refresh=False):
+    """GPT competitors for a catalog of `(product_name, manufacturer)` pairs.
+
+    Fresh cache entries are reused unless `refresh`. The rest are packed
+    `batch_size` products per chat completion with up to `concurrency` calls in
+    flight, all pausing together on a rate limit, and every result is written
+    to `competitor_cache` in one transaction. Returns
+    `{(product_name, manufacturer): names}`. Must run inside an app context.
+    """
+    batch_size = batch_size or GPT_BULK_BATCH
+    concurrency = concurrency or GPT_BULK_CONCURRENCY
+    keys = list(dict.fromkeys((product_name, manufacturer) for product_name, manufacturer in products))
+    rows = _load_rows(keys)
+
+    results = {}
+    misses = []
+    for key in keys:
+        row = rows.get(key)
+        if not refresh and row is not None and _age_seconds(row) < COMPETITOR_CACHE_TTL:
+            results[key] = json.loads(row.names)
+        else:
+            misses.append(key)
+    print(f"📦 Competitor cache: {len(keys) - len(misses)} fresh, {len(misses)} to discover.")
+
+    chunks = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
+    client = get_openai_client()
+    # Retries are handled here (rate limits through the shared gate) rather than by the client
+    client = client.with_options(max_retries=0) if client is not None else None
+    gate = _RateLimitGate()
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks)))) as pool:
+        for chunk, names in zip(chunks, pool.map(lambda chunk: _discover_chunk(client, chunk, gate), chunks)):
+            results.update(zip(chunk, names))
+
+    fetched_at = time.time()
+    try:
+        for key in misses:
+            row = rows.get(key)
+            if not results[key]:
+                # Keep serving what we had when GPT skipped or failed this product
+                results[key] = json.loads(row.names) if row is not None else []
+                continue
+            if row is None:
+                db.session.add(CompetitorCache(product_name=key[0], manufacturer=key[1], names=json.dumps(results[key])))
+            else:
+                row.names = json.dumps(results[key])
+                row.created_at = func.now()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for key, names in results.items():
+        if names:
+            _lru_put(key, names, fetched_at)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill GPT competitors for a product catalog")
+    parser.add_argument("catalog", help="JSON list of ASINs or of {product_name, manufacturer} objects")
+    parser.add_argument("--batch-size", type=int, default=GPT_BULK_BATCH)
+    parser.add_argument("--concurrency", type=int, default=GPT_BULK_CONCURRENCY)
+    parser.add_argument("--refresh", action="store_true", help="Refetch products that are still cached")
+    args = parser.parse_args()
+
+    from . import create_app
+    from .oxylabs_client import get_oxylabs_client
+
+    with open(args.catalog, encoding="utf-8") as f:
+        items = json.load(f)
+
+    def resolve(item):
+        if isinstance(item, str):
+            product = get_oxylabs_client().get_product(item)
+            return product.title or "Unknown", product.manufacturer or "Unknown"
+        return item["product_name"], item["manufacturer"]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        products = list(pool.map(resolve, items))
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        results = bulk_lookup_gpt_competitors(products, args.batch_size, args.concurrency, args.refresh)
+    found = sum(bool(names) for names in results.values())
+    print(f"✅ Competitors for {found}/{len(results)} products in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Gazetteer-based competitor counting.
+
+Brand names (`COMPETITOR_BRANDS` plus the product's GPT competitors from
+`CompetitorCache`) are compiled into one spaCy `PhraseMatcher` per product, so
+every review is matched in a single tokenizer pass instead of running NER.
+"""
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from spacy.matcher import PhraseMatcher
+from spacy.util import filter_spans
+
+# Comma-separated brands counted for every product, on top of its GPT competitors
+COMPETITOR_BRANDS = [b.strip() for b in os.getenv("COMPETITOR_BRANDS", "").split(",") if b.strip()]
+# Compiled matchers kept per process, least recently used evicted first
+MATCHER_CACHE_SIZE = int(os.getenv("MATCHER_CACHE_SIZE", 256))
+
+_matchers = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def gazetteer_terms(gpt_competitors=None, brands=None):
+    """Sorted, lowercased, de-duplicated brand names to match."""
+    names = list(COMPETITOR_BRANDS if brands is None else brands) + list(gpt_competitors or [])
+    return sorted({n.strip().lower() for n in names if isinstance(n, str) and n.strip()})
+
+def get_competitor_matcher(nlp, product_key, gpt_competitors=None, brands=None):
+    """The compiled matcher for `product_key`, rebuilt only when its brand names change."""
+    terms = tuple(gazetteer_terms(gpt_competitors, brands))
+    with _matchers_lock:
+        cached = _matchers.get(product_key)
+        if cached and cached[0] == terms and cached[1].vocab is nlp.vocab:
+            _matchers.move_to_end(product_key)
+            return cached[1]
+
+    matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+    for term in terms:
+        matcher.add(term, [nlp.make_doc(term)])
+
+    with _matchers_lock:
+        _matchers[product_key] = (terms, matcher)
+        _matchers.move_to_end(product_key)
+        while len(_matchers) > MATCHER_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    return matcher
+
+def match_competitors(reviews, matcher, nlp, batch_size=256):
+    """Per-review lists of matched brand names, longest match winning on overlaps."""
+    mentions = []
+    for doc in nlp.tokenizer.pipe(reviews, batch_size=batch_size):
+        spans = filter_spans(matcher(doc, as_spans=True))
+        mentions.append([span.label_ for span in spans])
+    return mentions
+
+def count_competitor_mentions(reviews, matcher, nlp):
+    """`{brand: mentions}` over all reviews, brands that never appear left out."""
+    counts = Counter()
+    for brands in match_competitors(reviews, matcher, nlp):
+        counts.update(brands)
+    return dict(counts)
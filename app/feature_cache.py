@@ -0,0 +1,38 @@
+import json
+
+from .models import db, ReviewFeatureCache, insert_ignoring_conflicts, query_in_chunks
+
+
+def _load_rows(hashes, nlp_id):
+    query = ReviewFeatureCache.query.filter(ReviewFeatureCache.nlp_id == nlp_id)
+    return list(query_in_chunks(query, ReviewFeatureCache.content_hash, hashes))
+
+def load_cached_features(hashes, nlp_id, entities=False):
+    """Return `{content_hash: (adjectives, orgs)}` for the hashes already parsed by `nlp_id`.
+
+    `orgs` is None for reviews parsed without NER; with `entities=True` those count as misses.
+    """
+    cached = {}
+    for row in _load_rows(hashes, nlp_id):
+        if entities and row.orgs is None:
+            continue
+        cached[row.content_hash] = (json.loads(row.adjectives), json.loads(row.orgs) if row.orgs is not None else None)
+    return cached
+
+def store_features(results, nlp_id, entities=False):
+    """Save `{content_hash: (adjectives, orgs)}`; with `entities=True` also fills in missing orgs."""
+    existing = {row.content_hash: row for row in _load_rows(results, nlp_id)}
+    new = []
+    for content_hash, (adjectives, orgs) in results.items():
+        row = existing.get(content_hash)
+        if row is None:
+            new.append({
+                "content_hash": content_hash,
+                "nlp_id": nlp_id,
+                "adjectives": json.dumps(adjectives),
+                "orgs": json.dumps(orgs) if entities else None
+            })
+        elif entities and row.orgs is None:
+            row.orgs = json.dumps(orgs)
+    insert_ignoring_conflicts(ReviewFeatureCache, new)
+    db.session.commit()
@@ -0,0 +1,145 @@
+import os
+import time
+
+from .model_client import MODEL_SERVER_URL, MODEL_SERVER_CHUNK, get_model_client
+from .utils import (
+    CASCADE_THRESHOLD,
+    SENTIMENT_CASCADE,
+    get_cascade_pipeline,
+    get_nlp,
+    get_sentiment_pipeline
+)
+
+SENTIMENT_MAX_LENGTH = 512
+# Padded tokens (batch size x longest review in the batch) per forward pass
+SENTIMENT_TOKEN_BUDGET = int(os.getenv("SENTIMENT_TOKEN_BUDGET", 4096))
+SENTIMENT_MAX_BATCH = int(os.getenv("SENTIMENT_MAX_BATCH", 64))
+
+
+# ---------------------
+# Length-Bucketed Batching
+# ---------------------
+def token_lengths(texts, tokenizer):
+    encoded = tokenizer(list(texts), truncation=True, max_length=SENTIMENT_MAX_LENGTH)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def plan_batches(lengths, token_budget=None, max_batch=None):
+    """Group indices of `lengths` into batches of similar length.
+
+    Indices are sorted by length and a batch is closed as soon as padding every
+    member to its longest one would exceed `token_budget`, or at `max_batch`.
+    """
+    token_budget = token_budget or SENTIMENT_TOKEN_BUDGET
+    max_batch = max_batch or SENTIMENT_MAX_BATCH
+
+    batches, current, longest = [], [], 0
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        padded = max(longest, lengths[i]) * (len(current) + 1)
+        if current and (padded > token_budget or len(current) >= max_batch):
+            batches.append(current)
+            current, longest = [], 0
+        current.append(i)
+        longest = max(longest, lengths[i])
+    if current:
+        batches.append(current)
+    return batches
+
+def iter_sentiment_batches(texts, pipe=None, token_budget=None, max_batch=None):
+    """Yield `(indices, results)` per forward pass; `indices` point back into `texts`.
+
+    Without an explicit `pipe` and with `MODEL_SERVER_URL` set, texts go to the
+    shared model server in chunks instead, and it does the bucketing.
+    """
+    if not texts:
+        return
+    if pipe is None and MODEL_SERVER_URL:
+        client = get_model_client()
+        for start in range(0, len(texts), MODEL_SERVER_CHUNK):
+            indices = list(range(start, min(start + MODEL_SERVER_CHUNK, len(texts))))
+            yield indices, client.classify([texts[i] for i in indices])
+        return
+    pipe = pipe or get_sentiment_pipeline()
+    for batch in plan_batches(token_lengths(texts, pipe.tokenizer), token_budget, max_batch):
+        results = pipe(
+            [texts[i] for i in batch],
+            truncation=True, max_length=SENTIMENT_MAX_LENGTH, padding=True, batch_size=len(batch)
+        )
+        yield batch, results
+
+def classify_sentiments(texts, pipe=None, token_budget=None, max_batch=None):
+    """Pipeline results for `texts`, in their original order."""
+    results = [None] * len(texts)
+    for batch, batch_results in iter_sentiment_batches(texts, pipe, token_budget, max_batch):
+        for i, r in zip(batch, batch_results):
+            results[i] = r
+    return results
+
+# ---------------------
+# Confidence Cascade
+# ---------------------
+def iter_cascade_batches(texts, threshold=None, stats=None):
+    """Like `iter_sentiment_batches`, but the cheap cascade model labels everything first.
+
+    Results scored at or above `threshold` are kept; the rest are escalated to
+    the main sentiment model. `stats`, if given, is filled with counts and timings.
+    """
+    threshold = CASCADE_THRESHOLD if threshold is None else threshold
+    stats = {} if stats is None else stats
+    stats.update(threshold=threshold, total=len(texts), accepted=0, escalated=0)
+
+    started = time.monotonic()
+    escalate = []
+    for indices, results in iter_sentiment_batches(texts, get_cascade_pipeline()):
+        accepted = [(i, r) for i, r in zip(indices, results) if r["score"] >= threshold]
+        escalate.extend(i for i, r in zip(indices, results) if r["score"] < threshold)
+        stats["accepted"] += len(accepted)
+        if accepted:
+            yield [i for i, _ in accepted], [r for _, r in accepted]
+    stats["cheap_seconds"] = round(time.monotonic() - started, 3)
+
+    started = time.monotonic()
+    for indices, results in iter_sentiment_batches([texts[i] for i in escalate]):
+        stats["escalated"] += len(indices)
+        yield [escalate[i] for i in indices], results
+    stats["escalation_seconds"] = round(time.monotonic() - started, 3)
+    stats["escalation_rate"] = round(len(escalate) / len(texts), 4) if texts else 0.0
+
+# ---------------------
+# Preload + Warmup
+# ---------------------
+WARMUP_TEXTS = [
+    "Great product, works exactly as described.",
+    "Stopped working after a week. Very disappointed with the quality and the support.",
+]
+
+def preload_models():
+    """Load every model this process will use, e.g. once in the gunicorn master before forking.
+
+    With an ONNX backend this is also where the model gets exported, so workers
+    find the file in place instead of exporting it on their first request.
+    """
+    if SENTIMENT_CASCADE:
+        # Not caught: a cascade model without a NEUTRAL class should stop startup
+        get_cascade_pipeline()
+
+    loaders = [get_nlp]
+    if not MODEL_SERVER_URL:
+        loaders.append(get_sentiment_pipeline)
+
+    for loader in loaders:
+        try:
+            loader()
+        except Exception as e:
+            print(f"[ERROR] {loader.__name__} failed to load: {e}")
+
+def warmup_models():
+    """Run one small inference pass so the first real request doesn't pay for lazy initialization."""
+    started = time.monotonic()
+    preload_models()
+    list(get_nlp().pipe(WARMUP_TEXTS))
+    if SENTIMENT_CASCADE:
+        list(iter_cascade_batches(WARMUP_TEXTS))
+    else:
+        classify_sentiments(WARMUP_TEXTS)
+    print(f"🔥 Models warmed up in {time.monotonic() - started:.2f}s (pid {os.getpid()}).")
+
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import uuid
+import threading
+import traceback
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import or_
+
+from .models import db, AnalysisJob
+from .analysis import analyze_reviews
+
+# "thread": jobs run on this process's pool. "external": web workers only
+# enqueue, and `python -m app.jobs` processes drain the table.
+JOB_RUNNER = os.getenv("JOB_RUNNER", "thread").lower()
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 2))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+# Minimum seconds between progress writes / cancellation checks for a running job
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", 0.5))
+# How long the synchronous /fetch_reviews wrapper waits before handing back the job id
+JOB_WAIT_TIMEOUT = float(os.getenv("JOB_WAIT_TIMEOUT", 600))
+# Worker liveness: heartbeat period, and how long without one before the job is reclaimed
+JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", 5))
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", 60))
+# Reclaimed jobs are requeued until they have been started this many times, then failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 2))
+JOB_SWEEP_INTERVAL = float(os.getenv("JOB_SWEEP_INTERVAL", 30))
+# Queued jobs younger than this are left to the pool they were submitted to
+JOB_REDISPATCH_AFTER = float(os.getenv("JOB_REDISPATCH_AFTER", 120))
+
+FINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+_executor = None
+_executor_lock = threading.Lock()
+_done_events = {}
+_sweeper_pid = None
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis-job")
+    return _executor
+
+# ---------------------
+# Submission + Control
+# ---------------------
+def submit_job(app, user_id, asin, count, incremental=False):
+    job = AnalysisJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        asin=asin,
+        count=count,
+        incremental=incremental,
+        status="queued"
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    if JOB_RUNNER == "thread":
+        _dispatch(app, job.id)
+    return job
+
+def _dispatch(app, job_id):
+    _done_events[job_id] = threading.Event()
+    _get_executor().submit(run_job, app, job_id)
+
+def cancel_job(job):
+    """Cancel a queued job now, or flag a running one to stop at its next checkpoint."""
+    if job.status in FINAL_STATUSES:
+        return job
+    job.cancel_requested = True
+    # Only flip queued -> cancelled if no worker claimed it in the meantime
+    claimed = AnalysisJob.query.filter_by(id=job.id, status="queued").update(
+        {"status": "cancelled", "finished_at": _now()}
+    )
+    db.session.commit()
+    if claimed:
+        _signal_done(job.id)
+    db.session.refresh(job)
+    return job
+
+def wait_for_job(job_id, timeout):
+    """Block until the job reaches a final status or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    done = _done_events.get(job_id)
+    if done is not None:
+        done.wait(timeout)
+    # Also covers a job that another process claimed first or picked up after a requeue
+    while True:
+        db.session.expire_all()
+        status = db.session.query(AnalysisJob.status).filter_by(id=job_id).scalar()
+        if status in FINAL_STATUSES or time.monotonic() >= deadline:
+            break
+        time.sleep(JOB_POLL_INTERVAL)
+
+    db.session.expire_all()
+    return db.session.get(AnalysisJob, job_id)
+
+def _signal_done(job_id):
+    done = _done_events.pop(job_id, None)
+    if done is not None:
+        done.set()
+
+# ---------------------
+# Execution
+# ---------------------
+def _claim(job_id, worker):
+    claimed = AnalysisJob.query.filter_by(id=job_id, status="queued").update({
+        "status": "running",
+        "started_at": _now(),
+        "worker": worker,
+        "heartbeat_at": time.time(),
+        "attempts": AnalysisJob.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def _heartbeat(app, job_id, worker, stop, lost):
+    with app.app_context():
+        while not stop.wait(JOB_HEARTBEAT):
+            held = AnalysisJob.query.filter_by(id=job_id, worker=worker, status="running").update(
+                {"heartbeat_at": time.time()}
+            )
+            db.session.commit()
+            if not held:
+                lost.set()
+                break
+        db.session.remove()
+
+def run_job(app, job_id):
+    worker = uuid.uuid4().hex
+    with app.app_context():
+        try:
+            if not _claim(job_id, worker):
+                return
+            stop, lost = threading.Event(), threading.Event()
+            threading.Thread(target=_heartbeat, args=(app, job_id, worker, stop, lost), daemon=True).start()
+            try:
+                _execute(app, job_id, worker, lost)
+            finally:
+                stop.set()
+        finally:
+            db.session.remove()
+            _signal_done(job_id)
+
+def _write(job_id, worker, values):
+    """Update the job only while `worker` still holds its lease; False once it was reclaimed."""
+    held = AnalysisJob.query.filter_by(id=job_id, worker=worker, status="running").update(values)
+    db.session.commit()
+    return held == 1
+
+def _execute(app, job_id, worker, lost):
+    job = db.session.get(AnalysisJob, job_id)
+    print(f"⚙️ Job {job_id} started: {job.asin} x{job.count} (attempt {job.attempts})")
+
+    events = analyze_reviews(app, job.user_id, job.asin, job.count, job.incremental)
+    result = progress = None
+    last_checkpoint = 0.0
+    try:
+        for event in events:
+            if event["event"] in ("snapshot", "message"):
+                result = json.dumps(event["data"])
+                continue
+
+            progress = json.dumps(event)
+            if time.monotonic() - last_checkpoint < JOB_PROGRESS_INTERVAL:
+                continue
+            last_checkpoint = time.monotonic()
+
+            if lost.is_set() or not _write(job_id, worker, {"progress": progress, "heartbeat_at": time.time()}):
+                events.close()
+                print(f"[WARNING] Job {job_id} was reclaimed from this worker; stopping.")
+                return
+
+            cancel = db.session.query(AnalysisJob.cancel_requested).filter_by(id=job_id).scalar()
+            if cancel:
+                events.close()
+                _write(job_id, worker, {"status": "cancelled", "finished_at": _now()})
+                print(f"🛑 Job {job_id} cancelled.")
+                return
+
+        final = {"status": "succeeded", "result": result, "finished_at": _now()}
+        if progress is not None:
+            final["progress"] = progress
+        if _write(job_id, worker, final):
+            print(f"✅ Job {job_id} finished.")
+        else:
+            print(f"[WARNING] Job {job_id} finished after it was reclaimed; result dropped.")
+    except Exception as e:
+        traceback.print_exc()
+        db.session.rollback()
+        _write(job_id, worker, {"status": "failed", "error": str(e) or e.__class__.__name__, "finished_at": _now()})
+
+# ---------------------
+# Recovery (jobs whose worker died)
+# ---------------------
+def reclaim_stale_jobs():
+    """Requeue running jobs whose worker stopped heartbeating, or fail them after `JOB_MAX_ATTEMPTS`.
+
+    Returns the number of jobs reclaimed. Must run inside an app context.
+    """
+    cutoff = time.time() - JOB_STALE_AFTER
+    stale = AnalysisJob.query.filter(
+        AnalysisJob.status == "running",
+        or_(AnalysisJob.heartbeat_at.is_(None), AnalysisJob.heartbeat_at < cutoff)
+    ).all()
+
+    reclaimed = 0
+    for job in stale:
+        if job.cancel_requested:
+            values = {"status": "cancelled", "finished_at": _now()}
+        elif (job.attempts or 0) >= JOB_MAX_ATTEMPTS:
+            values = {"status": "failed", "finished_at": _now(),
+                      "error": f"Worker stopped responding ({job.attempts} attempts)"}
+        else:
+            values = {"status": "queued", "started_at": None}
+        values.update({"worker": None, "heartbeat_at": None})
+        # Conditional on the lease we saw, so a worker that just heartbeated keeps its job
+        reclaimed += AnalysisJob.query.filter_by(
+            id=job.id, status="running", worker=job.worker, heartbeat_at=job.heartbeat_at
+        ).update(values)
+    db.session.commit()
+    if reclaimed:
+        print(f"♻️ Reclaimed {reclaimed} stale job(s).")
+    return reclaimed
+
+def _age_seconds(created_at):
+    if created_at is None:
+        return 0.0
+    # SQLite hands back naive UTC timestamps
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (_now() - created_at).total_seconds()
+
+def _orphaned_job_ids():
+    """Queued jobs old enough that the pool they were submitted to is presumably gone."""
+    rows = db.session.query(AnalysisJob.id, AnalysisJob.created_at).filter_by(status="queued").order_by(AnalysisJob.created_at)
+    return [job_id for job_id, created_at in rows if _age_seconds(created_at) >= JOB_REDISPATCH_AFTER]
+
+def _sweep(app):
+    """Reclaim stale jobs; with the thread runner, also run queued jobs no live pool holds."""
+    with app.app_context():
+        try:
+            reclaim_stale_jobs()
+            if JOB_RUNNER == "thread":
+                for job_id in _orphaned_job_ids():
+                    if job_id not in _done_events:
+                        _dispatch(app, job_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERROR] Job sweep failed: {e}")
+        finally:
+            db.session.remove()
+
+def start_job_sweeper(app):
+    """Recover jobs left behind by dead workers now, then every `JOB_SWEEP_INTERVAL` seconds.
+
+    Once per serving process: from gunicorn's `post_fork`, the first request,
+    or `run_worker`, never in a preloading master (see `run_diagnostics_on_startup`).
+    Claims are atomic, so several processes sweeping the same table only ever
+    start a job once.
+    """
+    global _sweeper_pid
+    with _executor_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+
+    def loop():
+        while True:
+            _sweep(app)
+            time.sleep(JOB_SWEEP_INTERVAL)
+
+    threading.Thread(target=loop, daemon=True, name="job-sweeper").start()
+
+# ---------------------
+# Standalone Worker
+# ---------------------
+def _next_queued_job_id():
+    return db.session.query(AnalysisJob.id).filter_by(status="queued").order_by(AnalysisJob.created_at).limit(1).scalar()
+
+def run_worker(app, workers=ANALYSIS_WORKERS):
+    """Drain queued jobs from the table with `workers` threads; runs forever."""
+    def loop():
+        while True:
+            with app.app_context():
+                job_id = _next_queued_job_id()
+                db.session.remove()
+            if job_id is None:
+                time.sleep(JOB_POLL_INTERVAL)
+                continue
+            run_job(app, job_id)
+
+    start_job_sweeper(app)
+    print(f"🚚 Analysis worker started with {workers} threads.")
+    threads = [threading.Thread(target=loop, daemon=True, name=f"analysis-worker-{i}") for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+if __name__ == "__main__":
+    from . import create_app
+    run_worker(create_app())
@@ -0,0 +1,51 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Base URL of `python -m app.model_server`; unset means every worker loads the model itself
+MODEL_SERVER_URL = (os.getenv("MODEL_SERVER_URL") or "").rstrip("/") or None
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", 120))
+# Texts per request to the server; also the granularity of streamed progress
+MODEL_SERVER_CHUNK = int(os.getenv("MODEL_SERVER_CHUNK", 64))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+class ModelClient:
+    """Pooled HTTP client for the shared sentiment model server."""
+
+    def __init__(self, url=MODEL_SERVER_URL, timeout=MODEL_SERVER_TIMEOUT, pool_size=16):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def classify(self, texts):
+        """Pipeline-shaped `[{"label", "score"}]` results for `texts`, in order."""
+        try:
+            resp = self.session.post(f"{self.url}/classify", json={"texts": list(texts)}, timeout=self.timeout)
+            resp.raise_for_status()
+            return resp.json()["results"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            raise ModelServerError(f"Model server request failed: {e}") from e
+
+    def metrics(self):
+        resp = self.session.get(f"{self.url}/metrics", timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+
+def get_model_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ModelClient()
+    return _client
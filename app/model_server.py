@@ -0,0 +1,217 @@
+"""Sentiment model server shared by every web worker.
+
+Loads the model once and merges texts from concurrent requests into
+micro-batches, flushed when `MODEL_SERVER_MAX_BATCH` texts are queued or
+`MODEL_SERVER_MAX_WAIT_MS` after the oldest one arrived. Web workers reach it
+through `MODEL_SERVER_URL` and never load the main model themselves; with
+`SENTIMENT_CASCADE=true` each still loads the small `CASCADE_MODEL` locally.
+
+It runs under gunicorn with one gthread worker, so the model and the batcher
+exist once and every request thread feeds the same queue:
+
+    python -m app.model_server --port 8765
+    gunicorn -w 1 -k gthread --threads 32 -b 127.0.0.1:8765 'app.model_server:create_model_app()'
+    MODEL_SERVER_URL=http://127.0.0.1:8765 gunicorn ...
+"""
+import os
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+
+from flask import Flask, request, jsonify
+
+MODEL_SERVER_MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", 128))
+MODEL_SERVER_MAX_WAIT_MS = float(os.getenv("MODEL_SERVER_MAX_WAIT_MS", 10))
+# Request threads of the single gunicorn worker; each one blocks while its texts are batched
+MODEL_SERVER_THREADS = int(os.getenv("MODEL_SERVER_THREADS", 32))
+# Recent flushes kept for the percentile metrics
+METRICS_WINDOW = 1000
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _Pending:
+    def __init__(self, texts):
+        self.texts = texts
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Queue texts from many request threads and run them through `classify` together."""
+
+    def __init__(self, classify, max_batch=MODEL_SERVER_MAX_BATCH, max_wait_ms=MODEL_SERVER_MAX_WAIT_MS):
+        self.classify = classify
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._totals = {"requests": 0, "texts": 0, "batches": 0, "errors": 0, "inference_seconds": 0.0}
+        self._batch_sizes = deque(maxlen=METRICS_WINDOW)
+        self._requests_per_batch = deque(maxlen=METRICS_WINDOW)
+        self._queue_waits_ms = deque(maxlen=METRICS_WINDOW)
+
+        threading.Thread(target=self._loop, daemon=True, name="micro-batcher").start()
+
+    def submit(self, texts):
+        pending = _Pending(list(texts))
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.results
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = batch[0].enqueued_at + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += len(pending.texts)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        texts = [t for pending in batch for t in pending.texts]
+        error = None
+        try:
+            results = self.classify(texts)
+        except Exception as e:
+            print(f"[ERROR] Micro-batch of {len(texts)} texts failed: {e}")
+            error = e
+        elapsed = time.monotonic() - started
+
+        offset = 0
+        for pending in batch:
+            if error is None:
+                pending.results = results[offset:offset + len(pending.texts)]
+            else:
+                pending.error = error
+            offset += len(pending.texts)
+            pending.done.set()
+
+        with self._lock:
+            self._totals["requests"] += len(batch)
+            self._totals["texts"] += len(texts)
+            self._totals["batches"] += 1
+            self._totals["errors"] += error is not None
+            self._totals["inference_seconds"] += elapsed
+            self._batch_sizes.append(len(texts))
+            self._requests_per_batch.append(len(batch))
+            self._queue_waits_ms.extend((started - p.enqueued_at) * 1000 for p in batch)
+
+    def metrics(self):
+        with self._lock:
+            sizes = list(self._batch_sizes)
+            waits = list(self._queue_waits_ms)
+            per_batch = list(self._requests_per_batch)
+            totals = dict(self._totals)
+
+        totals["inference_seconds"] = round(totals["inference_seconds"], 3)
+        return dict(
+            totals,
+            uptime_seconds=round(time.time() - self._started, 1),
+            queue_depth=self._queue.qsize(),
+            max_batch=self.max_batch,
+            max_wait_ms=self.max_wait * 1000,
+            batch_size={
+                "mean": round(sum(sizes) / len(sizes), 2) if sizes else None,
+                "p50": _percentile(sizes, 50),
+                "max": max(sizes, default=None),
+            },
+            requests_per_batch_mean=round(sum(per_batch) / len(per_batch), 2) if per_batch else None,
+            queue_wait_ms={
+                "p50": round(_percentile(waits, 50), 2) if waits else None,
+                "p99": round(_percentile(waits, 99), 2) if waits else None,
+            },
+        )
+
+
+def create_server_app(batcher):
+    server = Flask(__name__)
+
+    @server.route("/classify", methods=["POST"])
+    def classify():
+        payload = request.get_json(silent=True) or {}
+        texts = payload.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return jsonify({"error": "texts must be a list of strings"}), 400
+        try:
+            results = batcher.submit(texts)
+        except Exception as e:
+            return jsonify({"error": f"Inference failed: {e}"}), 500
+        return jsonify({"results": [{"label": r["label"], "score": float(r["score"])} for r in results]})
+
+    @server.route("/metrics", methods=["GET"])
+    def metrics():
+        return jsonify(batcher.metrics())
+
+    @server.route("/health", methods=["GET"])
+    def health():
+        return jsonify({"status": "ok"})
+
+    return server
+
+
+def create_model_app(max_batch=None, max_wait_ms=None):
+    """Load the model and return the server app; the gunicorn entry point."""
+    from .inference import classify_sentiments
+    from .utils import get_sentiment_pipeline
+
+    max_batch = max_batch or MODEL_SERVER_MAX_BATCH
+    max_wait_ms = MODEL_SERVER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+    # No spaCy runs beside it here, so inference gets every core
+    pipe = get_sentiment_pipeline(threads=os.cpu_count() or 1)
+    batcher = MicroBatcher(lambda texts: classify_sentiments(texts, pipe), max_batch, max_wait_ms)
+    print(f"🧠 Model server ready (max batch {max_batch}, max wait {max_wait_ms}ms)")
+    return create_server_app(batcher)
+
+
+def main():
+    from gunicorn.app.base import BaseApplication
+
+    parser = argparse.ArgumentParser(description="Shared sentiment model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MODEL_SERVER_PORT", 8765)))
+    parser.add_argument("--max-batch", type=int, default=MODEL_SERVER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MODEL_SERVER_MAX_WAIT_MS)
+    parser.add_argument("--threads", type=int, default=MODEL_SERVER_THREADS)
+    args = parser.parse_args()
+
+    class ModelServerApplication(BaseApplication):
+        # One worker: a second would load another model copy and split the batches
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", 1)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("timeout", 120)
+
+        def load(self):
+            return create_model_app(args.max_batch, args.max_wait_ms)
+
+    print(f"🧠 Model server on http://{args.host}:{args.port} ({args.threads} threads)")
+    ModelServerApplication().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,50 @@ import json
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import func
 
 db = SQLAlchemy()
 
+# Keeps IN (...) lists well under database parameter limits
+LOOKUP_CHUNK = 500
+
+
+def query_in_chunks(query, column, values):
+    """Yield the rows of `query` whose `column` is in `values`, one `IN (...)` of `LOOKUP_CHUNK` at a time.
+
+    Duplicate values are looked up once; any `order_by` on `query` holds within a chunk only.
+    """
+    values = list(set(values))
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        yield from query.filter(column.in_(values[start:start + LOOKUP_CHUNK]))
+
+def insert_ignoring_conflicts(model, rows):
+    """Insert `rows` (dicts of column values), skipping any that hit a unique constraint.
+
+    Meant for cache tables, where a concurrent run computing the same keys may
+    store some of them first: its rows are equivalent, so only those are skipped
+    and the rest of the batch still goes in. Nothing is committed. Uses
+    INSERT ... ON CONFLICT DO NOTHING on SQLite and PostgreSQL, and one
+    savepoint per row elsewhere.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.session.execute(insert(model).on_conflict_do_nothing(), rows)
+        return
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(model), [row])
+        except IntegrityError:
+            pass
+
 # ==============================
 # User Table
 # ==============================
@@ -135,6 +175,80 @@ class SentimentSnapshot(db.Model):
         }
 
 
+# ==============================
+# Analysis Jobs (Background Queue)
+# ==============================
+class AnalysisJob(db.Model):
+    __tablename__ = 'analysis_job'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    asin = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    incremental = db.Column(db.Boolean, default=False)
+
+    # queued -> running -> succeeded / failed / cancelled
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    cancel_requested = db.Column(db.Boolean, default=False)
+
+    # JSON fields
+    progress = db.Column(db.Text)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True))
+    finished_at = db.Column(db.DateTime(timezone=True))
+
+    # Lease held by the worker running the job; epoch seconds, like AnalysisFlight
+    worker = db.Column(db.String(64))
+    heartbeat_at = db.Column(db.Float)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_job_user_created', 'user_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<AnalysisJob {self.id} ASIN={self.asin} Status={self.status}>"
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "asin": self.asin,
+            "count": self.count,
+            "incremental": self.incremental,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "attempts": self.attempts,
+            "progress": json.loads(self.progress) if self.progress else None,
+            "error": self.error,
+            "created_at": str(self.created_at) if self.created_at else None,
+            "started_at": str(self.started_at) if self.started_at else None,
+            "finished_at": str(self.finished_at) if self.finished_at else None
+        }
+
+
+# ==============================
+# In-Flight Analyses (Cross-Worker Coalescing)
+# ==============================
+class AnalysisFlight(db.Model):
+    __tablename__ = 'analysis_flight'
+
+    key = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(64), nullable=False)
+    # running -> done / failed
+    status = db.Column(db.String(20), nullable=False, default="running")
+    result = db.Column(db.Text)
+
+    # Epoch seconds, so staleness checks don't depend on the database's timezone handling
+    heartbeat_at = db.Column(db.Float, nullable=False)
+    finished_at = db.Column(db.Float)
+
+    def __repr__(self):
+        return f"<AnalysisFlight {self.key} Status={self.status} Owner={self.owner}>"
+
+
 # ==============================
 # GPT Competitor Cache
 # ==============================
@@ -145,7 +259,111 @@ class CompetitorCache(db.Model):
     product_name = db.Column(db.String(300), nullable=False)
     manufacturer = db.Column(db.String(200), nullable=False)
     names = db.Column(db.Text, nullable=False)
+    # Refreshed whenever the names are refetched; COMPETITOR_CACHE_TTL is measured from it
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        db.Index('ix_competitor_cache_product', 'product_name', 'manufacturer'),
+    )
+
     def __repr__(self):
         return f"<GPTCache {self.product_name} by {self.manufacturer}>"
+
+
+# ==============================
+# Shared Per-ASIN Analysis (User-Independent)
+# ==============================
+class ProductAnalysis(db.Model):
+    __tablename__ = 'product_analysis'
+
+    id = db.Column(db.Integer, primary_key=True)
+    asin = db.Column(db.String(20), nullable=False)
+    sort_by = db.Column(db.String(20), nullable=False, default="recent")
+    product_name = db.Column(db.String(300))
+    manufacturer = db.Column(db.String(200))
+    price = db.Column(db.Float)
+
+    # JSON fields
+    gpt_competitors = db.Column(db.Text)
+    adjective_counts = db.Column(db.Text)
+    competitor_counts = db.Column(db.Text)
+
+    review_count = db.Column(db.Integer, default=0)
+    # True when the last full scrape ran out of pages before reaching its count
+    exhausted = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('asin', 'sort_by', name='uq_product_analysis_asin_sort'),
+    )
+
+    def __repr__(self):
+        return f"<ProductAnalysis ASIN={self.asin} Reviews={self.review_count}>"
+
+
+class ProductReview(db.Model):
+    __tablename__ = 'product_review'
+
+    id = db.Column(db.Integer, primary_key=True)
+    asin = db.Column(db.String(20), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    title = db.Column(db.Text)
+    content = db.Column(db.Text, nullable=False)
+    helpful_count = db.Column(db.Integer, default=0)
+    country = db.Column(db.String(100))
+    review_date = db.Column(db.String(20))
+    label = db.Column(db.String(20), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    first_seen = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('asin', 'content_hash', name='uq_product_review_asin_hash'),
+    )
+
+    def __repr__(self):
+        return f"<ProductReview ASIN={self.asin} Hash={self.content_hash[:12]} Label={self.label}>"
+
+
+# ==============================
+# Per-Review Sentiment Cache (by content hash + model)
+# ==============================
+class SentimentCache(db.Model):
+    __tablename__ = 'sentiment_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    model_id = db.Column(db.String(200), nullable=False)
+    # Raw pipeline output; LABEL_MAPPING is applied on read
+    label = db.Column(db.String(50), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'model_id', name='uq_sentiment_hash_model'),
+    )
+
+    def __repr__(self):
+        return f"<SentimentCache Hash={self.content_hash[:12]} Model={self.model_id} Label={self.label}>"
+
+
+# ==============================
+# Per-Review NLP Feature Cache (by content hash + spaCy model)
+# ==============================
+class ReviewFeatureCache(db.Model):
+    __tablename__ = 'review_feature_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    nlp_id = db.Column(db.String(200), nullable=False)
+    # JSON lists, in document order with repeats, so counts merge across reviews
+    adjectives = db.Column(db.Text, nullable=False)
+    # NULL when the review was parsed without NER
+    orgs = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'nlp_id', name='uq_review_feature_hash_nlp'),
+    )
+
+    def __repr__(self):
+        return f"<ReviewFeatureCache Hash={self.content_hash[:12]} NLP={self.nlp_id}>"
@@ -0,0 +1,193 @@
+"""ONNX Runtime backend for the sentiment model, optionally int8-quantized.
+
+Selected with `SENTIMENT_BACKEND=onnx` or `onnx-int8`. The model is exported on
+first use (which needs torch once; `preload_models()` does it in the gunicorn
+master), or ahead of time with:
+
+    python -m app.onnx_backend --int8
+"""
+import os
+import fcntl
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(".cache", "onnx"))
+# 0 lets ONNX Runtime pick one thread per physical core; the app passes its
+# INFERENCE_CPU_SHARE unless this is set
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))
+ONNX_OPSET = 17
+
+
+def onnx_model_path(model_name, quantize=False, model_dir=None):
+    slug = model_name.strip("/").replace("/", "--")
+    filename = "model.int8.onnx" if quantize else "model.onnx"
+    return os.path.join(model_dir or ONNX_MODEL_DIR, slug, filename)
+
+# ---------------------
+# Export + Quantization
+# ---------------------
+@contextmanager
+def _export_lock(path):
+    """Exclusive lock on `path` across processes, so only one worker writes it."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextmanager
+def _atomic_path(path):
+    """A temporary file next to `path`, moved into place only if the block succeeds."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp.onnx")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _export_fp32(model_name, path):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    print(f"📦 Exporting {model_name} to ONNX...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, attn_implementation="eager")
+    model.eval()
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    sample = tokenizer(["Great product.", "It broke after a week of use."], padding=True, return_tensors="pt")
+    directory = os.path.dirname(path)
+    # Tokenizer and config first: the model file appearing is what marks the export done
+    tokenizer.save_pretrained(directory)
+    model.config.save_pretrained(directory)
+    with _atomic_path(path) as tmp_path:
+        torch.onnx.export(
+            LogitsOnly(model),
+            (sample["input_ids"], sample["attention_mask"]),
+            tmp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+            dynamo=False
+        )
+    print(f"✅ Exported {path}")
+
+def export_onnx(model_name, quantize=False, model_dir=None):
+    """Export `model_name` (and its int8 variant if `quantize`) unless already on disk; returns the path.
+
+    Safe to call from several workers at once: one exports under a file lock
+    while the others wait, and files only appear at their final path complete.
+    """
+    fp32_path = onnx_model_path(model_name, False, model_dir)
+    if not os.path.exists(fp32_path):
+        with _export_lock(fp32_path):
+            # Another worker may have finished it while we waited for the lock
+            if not os.path.exists(fp32_path):
+                _export_fp32(model_name, fp32_path)
+    if not quantize:
+        return fp32_path
+
+    int8_path = onnx_model_path(model_name, True, model_dir)
+    if not os.path.exists(int8_path):
+        with _export_lock(int8_path):
+            if not os.path.exists(int8_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                print("📦 Quantizing ONNX weights to int8...")
+                with _atomic_path(int8_path) as tmp_path:
+                    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+                print(f"✅ Quantized {int8_path}")
+    return int8_path
+
+# ---------------------
+# Inference
+# ---------------------
+class OnnxSentimentPipeline:
+    """Stand-in for the transformers sentiment pipeline: same call signature and output shape."""
+
+    def __init__(self, path, tokenizer, id2label, intra_op_threads=ONNX_INTRA_OP_THREADS):
+        self.path = path
+        self.intra_op_threads = intra_op_threads
+        self.tokenizer = tokenizer
+        self.id2label = {int(k): v for k, v in id2label.items()}
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        # ONNX Runtime thread pools don't survive fork, so each process opens its own session
+        if self._session is None or self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    import onnxruntime as ort
+
+                    options = ort.SessionOptions()
+                    if self.intra_op_threads:
+                        options.intra_op_num_threads = self.intra_op_threads
+                    self._session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def __call__(self, texts, truncation=True, max_length=512, padding=True, batch_size=8, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                truncation=truncation, max_length=max_length, padding=True, return_tensors="np"
+            )
+            logits = self.session.run(["logits"], {
+                "input_ids": encoded["input_ids"].astype(np.int64),
+                "attention_mask": encoded["attention_mask"].astype(np.int64),
+            })[0]
+            # Softmax + top-1, as the text-classification pipeline does for multi-class models
+            exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probs = exp / exp.sum(axis=-1, keepdims=True)
+            for row in probs:
+                best = int(row.argmax())
+                results.append({"label": self.id2label[best], "score": float(row[best])})
+        return results
+
+def load_onnx_pipeline(model_name, quantize=False, model_dir=None, intra_op_threads=ONNX_INTRA_OP_THREADS):
+    from transformers import AutoConfig, AutoTokenizer
+
+    path = export_onnx(model_name, quantize, model_dir)
+    directory = os.path.dirname(path)
+    config = AutoConfig.from_pretrained(directory)
+    return OnnxSentimentPipeline(path, AutoTokenizer.from_pretrained(directory), config.id2label, intra_op_threads)
+
+
+def main():
+    from .utils import SENTIMENT_MODEL
+
+    parser = argparse.ArgumentParser(description="Export the sentiment model to ONNX")
+    parser.add_argument("--model", default=SENTIMENT_MODEL)
+    parser.add_argument("--int8", action="store_true", help="Also write the dynamically quantized int8 model")
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+    print(export_onnx(args.model, args.int8, args.model_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .response_cache import ResponseCache
+
+OXYLABS_URL = os.getenv("OXYLABS_URL", "https://realtime.oxylabs.io/v1/queries")
+OXYLABS_TIMEOUT = float(os.getenv("OXYLABS_TIMEOUT", 60))
+OXYLABS_MAX_RETRIES = int(os.getenv("OXYLABS_MAX_RETRIES", 3))
+OXYLABS_POOL_SIZE = int(os.getenv("OXYLABS_POOL_SIZE", 16))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+OXYLABS_CACHE_ENABLED = os.getenv("OXYLABS_CACHE_ENABLED", "true").lower() == "true"
+OXYLABS_CACHE_DIR = os.getenv("OXYLABS_CACHE_DIR", os.path.join(".cache", "oxylabs"))
+OXYLABS_CACHE_MAX_MB = int(os.getenv("OXYLABS_CACHE_MAX_MB", 256))
+OXYLABS_CACHE_MAX_STALE = int(os.getenv("OXYLABS_CACHE_MAX_STALE", 7 * 24 * 3600))
+# Seconds a cached response stays fresh, per Oxylabs source
+OXYLABS_CACHE_TTLS = {
+    "amazon_product": int(os.getenv("OXYLABS_CACHE_TTL_PRODUCT", 6 * 3600)),
+    "amazon_reviews": int(os.getenv("OXYLABS_CACHE_TTL_REVIEWS", 30 * 60)),
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class OxylabsError(requests.exceptions.RequestException):
+    pass
+
+
+# ---------------------
+# Typed Results
+# ---------------------
+@dataclass
+class ProductPage:
+    asin: str
+    title: str = None
+    manufacturer: str = None
+    price: float = None
+    content: dict = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class ReviewPage:
+    asin: str
+    page: int
+    reviews: list = field(default_factory=list)
+    product_title: str = None
+    content: dict = field(default_factory=dict, repr=False)
+
+
+# ---------------------
+# Client
+# ---------------------
+class OxylabsClient:
+    """Pooled Oxylabs realtime client shared by all request threads."""
+
+    def __init__(self, username=None, password=None, url=OXYLABS_URL, timeout=OXYLABS_TIMEOUT,
+                 max_retries=OXYLABS_MAX_RETRIES, pool_size=OXYLABS_POOL_SIZE,
+                 backoff_base=0.5, backoff_cap=8.0, cache=None):
+        self.url = url
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.session = requests.Session()
+        self.session.auth = (
+            username or os.getenv("OXYLABS_USERNAME"),
+            password or os.getenv("OXYLABS_PASSWORD")
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        # Full jitter keeps parallel page fetches from retrying in lockstep
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _cache_key(payload):
+        context = {c["key"]: c["value"] for c in payload.get("context", [])}
+        return [
+            payload.get("source"),
+            payload.get("query"),
+            payload.get("page"),
+            context.get("sort_by"),
+            payload.get("geo_location"),
+        ]
+
+    def query(self, payload, timeout=None):
+        if self.cache is None:
+            return self._post(payload, timeout)
+
+        key = self._cache_key(payload)
+        ttl = OXYLABS_CACHE_TTLS.get(payload.get("source"), 0)
+        cached = self.cache.get(key, ttl)
+        if cached is not None:
+            return cached
+
+        try:
+            data = self._post(payload, timeout)
+        except OxylabsError:
+            stale = self.cache.get(key, ttl, allow_stale=True, max_stale=OXYLABS_CACHE_MAX_STALE)
+            if stale is None:
+                raise
+            print(f"[WARNING] Oxylabs unavailable, serving stale {payload.get('source')} for {payload.get('query')}")
+            return stale
+
+        self.cache.set(key, data)
+        return data
+
+    def _post(self, payload, timeout=None):
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                resp = self.session.post(self.url, json=payload, timeout=timeout or self.timeout)
+                if resp.status_code not in RETRY_STATUSES:
+                    resp.raise_for_status()
+                    return resp.json()
+                retry_after = resp.headers.get("Retry-After")
+                last_error = OxylabsError(f"Oxylabs returned {resp.status_code}", response=resp)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = e
+            except requests.exceptions.RequestException as e:
+                raise OxylabsError(str(e), response=getattr(e, "response", None)) from e
+            except ValueError as e:
+                raise OxylabsError(f"Invalid JSON from Oxylabs: {e}") from e
+
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, retry_after)
+                print(f"[WARNING] Oxylabs {payload.get('source')} attempt {attempt + 1} failed ({last_error}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        raise OxylabsError(f"Oxylabs request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    @staticmethod
+    def _first_content(data):
+        results = data.get("results") or [{}]
+        return results[0].get("content") or {}
+
+    def get_product(self, asin, timeout=None):
+        content = self._first_content(self.query(
+            {"source": "amazon_product", "query": asin, "parse": True},
+            timeout=timeout
+        ))
+        return ProductPage(
+            asin=asin,
+            title=content.get("title"),
+            manufacturer=content.get("manufacturer"),
+            price=content.get("price"),
+            content=content
+        )
+
+    def get_review_page(self, asin, page, sort_by="recent", geo_location="90210", timeout=None):
+        content = self._first_content(self.query({
+            "source": "amazon_reviews",
+            "query": asin,
+            "page": page,
+            "pages": 1,
+            "context": [{"key": "sort_by", "value": sort_by}],
+            "geo_location": geo_location,
+            "parse": True
+        }, timeout=timeout))
+        return ReviewPage(
+            asin=asin,
+            page=page,
+            reviews=content.get("reviews") or [],
+            product_title=content.get("title"),
+            content=content
+        )
+
+
+def get_oxylabs_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cache = None
+                if OXYLABS_CACHE_ENABLED:
+                    cache = ResponseCache(OXYLABS_CACHE_DIR, max_bytes=OXYLABS_CACHE_MAX_MB * 1024 * 1024)
+                _client = OxylabsClient(cache=cache)
+    return _client
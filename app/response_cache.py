@@ -0,0 +1,132 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+
+class ResponseCache:
+    """Size-bounded, gzip-compressed on-disk cache of JSON responses.
+
+    Entries are content-addressed by a SHA-256 of their key, written atomically
+    so several gunicorn workers can share one directory, and evicted least
+    recently used first (file mtime is bumped on every hit).
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale_hits": 0, "stores": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json.gz")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json.gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key, ttl, allow_stale=False, max_stale=None):
+        """Return the cached value for `key`, or None.
+
+        Entries older than `ttl` seconds are a miss unless `allow_stale` is set,
+        in which case anything younger than `max_stale` (if given) is returned.
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError, EOFError):
+            if not allow_stale:
+                self._count("misses")
+            return None
+
+        age = time.time() - entry.get("stored_at", 0)
+        if age <= ttl:
+            self._count("hits")
+        elif allow_stale and (max_stale is None or age <= max_stale):
+            self._count("stale_hits")
+        else:
+            if not allow_stale:
+                self._count("misses")
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("value")
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(json.dumps({"key": key, "stored_at": time.time(), "value": value}).encode("utf-8"))
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARNING] Failed to write cache entry: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._count("stores")
+        with self._lock:
+            # Overwriting a key (e.g. refreshing an expired entry) only adds the difference
+            self._size += size - replaced
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits `max_bytes`."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            # Evict down to 90% so a full cache doesn't sweep on every store
+            target = self.max_bytes * 0.9
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self._stats["evictions"] += 1
+            self._size = total
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size_bytes"] = self._size
+            stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,23 @@
+from .models import db, SentimentCache, insert_ignoring_conflicts, query_in_chunks
+
+
+def load_cached_sentiments(hashes, model_id):
+    """Return `{content_hash: {"label", "score"}}` for the hashes already scored by `model_id`."""
+    query = db.session.query(SentimentCache.content_hash, SentimentCache.label, SentimentCache.score).filter(
+        SentimentCache.model_id == model_id
+    )
+    return {
+        content_hash: {"label": label, "score": score}
+        for content_hash, label, score in query_in_chunks(query, SentimentCache.content_hash, hashes)
+    }
+
+def store_sentiments(results, model_id):
+    """Save `{content_hash: pipeline_output}`; entries another request stored first are skipped."""
+    new = {h: r for h, r in results.items() if h not in load_cached_sentiments(results, model_id)}
+    if not new:
+        return
+    insert_ignoring_conflicts(SentimentCache, [
+        {"content_hash": h, "model_id": model_id, "label": r["label"], "score": float(r["score"])}
+        for h, r in new.items()
+    ])
+    db.session.commit()
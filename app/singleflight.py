@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import threading
+import traceback
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, AnalysisFlight
+
+# Leader liveness: heartbeat period, and how long without one before another worker takes over
+COALESCE_HEARTBEAT = float(os.getenv("COALESCE_HEARTBEAT", 5))
+COALESCE_STALE_AFTER = float(os.getenv("COALESCE_STALE_AFTER", 60))
+# A just-finished result is handed to requests arriving this many seconds later
+COALESCE_RESULT_TTL = float(os.getenv("COALESCE_RESULT_TTL", 10))
+COALESCE_POLL_INTERVAL = float(os.getenv("COALESCE_POLL_INTERVAL", 0.5))
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class FlightAbandoned(Exception):
+    pass
+
+
+class _Flight:
+    """Events of one in-process run, replayed to every thread waiting on it."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._events = []
+        self._done = False
+        self._error = None
+        self._followers = 0
+
+    def join(self):
+        with self._cond:
+            self._followers += 1
+
+    def leave(self):
+        with self._cond:
+            self._followers -= 1
+
+    @property
+    def abandoned(self):
+        with self._cond:
+            return self._followers == 0
+
+    def publish(self, event):
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def follow(self):
+        seen = 0
+        while True:
+            with self._cond:
+                while seen >= len(self._events) and not self._done:
+                    self._cond.wait()
+                batch = self._events[seen:]
+                seen = len(self._events)
+                done, error = self._done, self._error
+            yield from batch
+            if done:
+                if error is not None:
+                    raise RuntimeError(f"Shared analysis failed: {error}") from error
+                return
+
+# ---------------------
+# Public Entry Point
+# ---------------------
+def coalesced(app, key, compute):
+    """Run `compute()` (an event generator) once per `key` across threads and workers.
+
+    The first caller in a process starts the run on a background thread; every
+    caller, including the first, receives the same events. Across gunicorn
+    workers the `analysis_flight` table elects one leader and the others wait
+    for its stored result. The run stops early if every caller goes away.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    flight.join()
+    try:
+        if leader:
+            threading.Thread(target=_lead, args=(app, key, compute, flight), daemon=True).start()
+        else:
+            print(f"🔗 Joining in-flight analysis {key}")
+        yield from flight.follow()
+    finally:
+        flight.leave()
+
+def _lead(app, key, compute, flight):
+    try:
+        with app.app_context():
+            for event in _run_or_wait(app, key, compute, flight):
+                flight.publish(event)
+        flight.finish()
+    except Exception as e:
+        if not isinstance(e, FlightAbandoned):
+            traceback.print_exc()
+        flight.finish(e)
+    finally:
+        with _flights_lock:
+            if _flights.get(key) is flight:
+                del _flights[key]
+
+# ---------------------
+# Cross-Worker Election
+# ---------------------
+def _acquire(key, owner):
+    """Return `(state, result)` where state is leader, follower, result or retry."""
+    now = time.time()
+    try:
+        db.session.add(AnalysisFlight(key=key, owner=owner, status="running", heartbeat_at=now))
+        db.session.commit()
+        return "leader", None
+    except IntegrityError:
+        db.session.rollback()
+
+    row = db.session.get(AnalysisFlight, key)
+    if row is None:
+        return "retry", None
+    if row.status == "running" and now - row.heartbeat_at < COALESCE_STALE_AFTER:
+        return "follower", None
+    if row.status == "done" and row.finished_at and now - row.finished_at < COALESCE_RESULT_TTL:
+        return "result", row.result
+
+    # Finished long ago, failed, or the leader died: take the row over, and clear
+    # out any other rows left behind by workers that died before deleting them
+    _sweep_stale(key, now)
+    taken = AnalysisFlight.query.filter_by(key=key, owner=row.owner, heartbeat_at=row.heartbeat_at).update({
+        "owner": owner, "status": "running", "heartbeat_at": now, "result": None, "finished_at": None
+    })
+    db.session.commit()
+    return ("leader" if taken else "retry"), None
+
+def _sweep_stale(key, now):
+    AnalysisFlight.query.filter(
+        AnalysisFlight.key != key,
+        or_(
+            AnalysisFlight.finished_at < now - COALESCE_RESULT_TTL,
+            AnalysisFlight.heartbeat_at < now - COALESCE_STALE_AFTER
+        )
+    ).delete(synchronize_session=False)
+
+def _delete(key, owner):
+    AnalysisFlight.query.filter_by(key=key, owner=owner).delete()
+    db.session.commit()
+
+def _delete_later(app, key, owner):
+    """Drop the finished row once late arrivals can no longer reuse its result."""
+    def run():
+        with app.app_context():
+            try:
+                _delete(key, owner)
+            except Exception as e:
+                db.session.rollback()
+                print(f"[WARNING] Could not delete finished flight {key}: {e}")
+            finally:
+                db.session.remove()
+
+    timer = threading.Timer(COALESCE_RESULT_TTL, run)
+    timer.daemon = True
+    timer.start()
+
+def _release(app, key, owner, status, result=None):
+    db.session.rollback()
+    if status == "failed":
+        # Waiters treat a missing row like a failed one and retry the election
+        _delete(key, owner)
+        return
+    AnalysisFlight.query.filter_by(key=key, owner=owner).update({
+        "status": status,
+        "result": json.dumps(result) if result is not None else None,
+        "finished_at": time.time()
+    })
+    db.session.commit()
+    _delete_later(app, key, owner)
+
+def _heartbeat(app, key, owner, stop):
+    with app.app_context():
+        while not stop.wait(COALESCE_HEARTBEAT):
+            AnalysisFlight.query.filter_by(key=key, owner=owner).update({"heartbeat_at": time.time()})
+            db.session.commit()
+        db.session.remove()
+
+def _run_or_wait(app, key, compute, flight):
+    owner = uuid.uuid4().hex
+    announced = False
+    while True:
+        state, result = _acquire(key, owner)
+        if state == "leader":
+            yield from _run_as_leader(app, key, owner, compute, flight)
+            return
+        if state == "result":
+            yield {"event": "analysis", "data": json.loads(result)}
+            return
+        if state == "follower":
+            if not announced:
+                print(f"🔗 Waiting on analysis {key} running in another worker")
+                yield {"event": "coalesced", "key": key}
+                announced = True
+            result = _wait_remote(key, flight)
+            if result is not None:
+                yield {"event": "analysis", "data": result}
+                return
+
+def _run_as_leader(app, key, owner, compute, flight):
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(app, key, owner, stop), daemon=True).start()
+
+    result = None
+    events = compute()
+    try:
+        for event in events:
+            if event["event"] == "analysis":
+                result = event["data"]
+            yield event
+            if flight.abandoned:
+                events.close()
+                raise FlightAbandoned(key)
+    except BaseException:
+        stop.set()
+        _release(app, key, owner, "failed")
+        raise
+
+    stop.set()
+    _release(app, key, owner, "done", result)
+
+def _wait_remote(key, flight):
+    """Poll until the remote leader finishes; None means it failed or died."""
+    while True:
+        if flight.abandoned:
+            raise FlightAbandoned(key)
+        time.sleep(COALESCE_POLL_INTERVAL)
+
+        db.session.expire_all()
+        row = db.session.get(AnalysisFlight, key)
+        if row is None or row.status == "failed":
+            return None
+        if row.status == "done":
+            return json.loads(row.result)
+        if time.time() - row.heartbeat_at > COALESCE_STALE_AFTER:
+            return None
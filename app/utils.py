@@ -3,15 +3,55 @@ import json
 import threading
 import re
 import hashlib
-from collections import Counter
 from datetime import datetime
-from openai import OpenAI
-from transformers import pipeline as transformers_pipeline
+from openai import APIConnectionError, InternalServerError, OpenAI, RateLimitError
 import spacy
 import spacy.cli
 
 _sentiment_pipeline = None
+_cascade_pipeline = None
 _nlp_model = None
+_openai_client = None
+# One lock per model so a slow load of one doesn't block the others
+_nlp_lock = threading.Lock()
+_sentiment_lock = threading.Lock()
+_cascade_lock = threading.Lock()
+_openai_lock = threading.Lock()
+
+SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "cardiffnlp/twitter-roberta-base-sentiment-latest")
+# "torch" (transformers pipeline), "onnx" or "onnx-int8" (ONNX Runtime, see onnx_backend.py)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch").lower()
+# Confidence cascade: a cheap model labels every review and only those scored
+# below CASCADE_THRESHOLD are sent to SENTIMENT_MODEL. There is no default
+# CASCADE_MODEL: it must have a NEUTRAL class like the main model, and startup
+# fails without one.
+SENTIMENT_CASCADE = os.getenv("SENTIMENT_CASCADE", "false").lower() == "true"
+CASCADE_MODEL = os.getenv("CASCADE_MODEL", "")
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", 0.95))
+# Cached sentiment results are keyed on this, so switching model, backend or cascade starts fresh
+SENTIMENT_MODEL_ID = SENTIMENT_MODEL if SENTIMENT_BACKEND == "torch" else f"{SENTIMENT_MODEL}@{SENTIMENT_BACKEND}"
+if SENTIMENT_CASCADE:
+    SENTIMENT_MODEL_ID += f"+cascade:{CASCADE_MODEL}@{CASCADE_THRESHOLD}"
+
+# Only tok2vec, tagger and ner are needed for adjectives + ORG entities
+SPACY_EXCLUDE = ["parser", "attribute_ruler", "lemmatizer", "senter"]
+# Without the attribute_ruler pos_ is unset, so adjectives come from the tagger's tags
+ADJECTIVE_TAGS = {"JJ", "JJR", "JJS", "AFX"}
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 256))
+# Corpora at least this large are split across SPACY_N_PROCESS processes (offline use;
+# the request path always parses in-process)
+SPACY_MULTIPROCESS_THRESHOLD = int(os.getenv("SPACY_MULTIPROCESS_THRESHOLD", 2000))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", min(4, os.cpu_count() or 1)))
+# Cores shared by sentiment inference and spaCy while they run side by side:
+# spaCy keeps one, torch / ONNX Runtime threads get the rest
+STAGE_CPU_BUDGET = int(os.getenv("STAGE_CPU_BUDGET", os.cpu_count() or 1))
+INFERENCE_CPU_SHARE = max(1, STAGE_CPU_BUDGET - 1)
+
+# Point at a local stand-in (see devtools/stub_server.py) for offline runs
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Per HTTP attempt; callers that can't wait this long put their own deadline on top
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 20))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 1))
 
 # ---------------------
 # NLP + Pipeline Lazy Loaders
@@ -19,64 +59,135 @@ _nlp_model = None
 def get_nlp():
     global _nlp_model
     if _nlp_model is None:
-        print("📦 Loading SpaCy model...")
-        try:
-            _nlp_model = spacy.load("en_core_web_sm")
-            print("✅ SpaCy model loaded.")
-        except OSError:
-            print("⬇️ Downloading SpaCy model...")
-            spacy.cli.download("en_core_web_sm")
-            _nlp_model = spacy.load("en_core_web_sm")
-            print("✅ SpaCy model downloaded and loaded.")
+        with _nlp_lock:
+            if _nlp_model is None:
+                print("📦 Loading SpaCy model...")
+                try:
+                    _nlp_model = spacy.load("en_core_web_sm", exclude=SPACY_EXCLUDE)
+                    print(f"✅ SpaCy model loaded: {_nlp_model.pipe_names}")
+                except OSError:
+                    print("⬇️ Downloading SpaCy model...")
+                    spacy.cli.download("en_core_web_sm")
+                    _nlp_model = spacy.load("en_core_web_sm", exclude=SPACY_EXCLUDE)
+                    print("✅ SpaCy model downloaded and loaded.")
     return _nlp_model
 
-def get_sentiment_pipeline():
+def _limit_torch_threads(threads):
+    import torch
+    torch.set_num_threads(threads)
+
+def get_sentiment_pipeline(threads=None):
+    """The sentiment pipeline, loaded once per process.
+
+    `threads` caps torch / ONNX Runtime intra-op threads on first load,
+    `INFERENCE_CPU_SHARE` unless given; the model server, which runs no spaCy
+    beside it, passes every core.
+    """
     global _sentiment_pipeline
     if _sentiment_pipeline is None:
-        print("📦 Loading sentiment analysis model...")
-        _sentiment_pipeline = transformers_pipeline(
-            "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest"
-        )
-        print("✅ Sentiment pipeline loaded.")
+        with _sentiment_lock:
+            if _sentiment_pipeline is None:
+                threads = threads or INFERENCE_CPU_SHARE
+                print(f"📦 Loading sentiment analysis model ({SENTIMENT_BACKEND}, {threads} threads)...")
+                if SENTIMENT_BACKEND in ("onnx", "onnx-int8"):
+                    from .onnx_backend import ONNX_INTRA_OP_THREADS, load_onnx_pipeline
+                    _sentiment_pipeline = load_onnx_pipeline(
+                        SENTIMENT_MODEL,
+                        quantize=SENTIMENT_BACKEND == "onnx-int8",
+                        intra_op_threads=ONNX_INTRA_OP_THREADS or threads
+                    )
+                else:
+                    # Imported here so workers using the model server never load torch weights
+                    from transformers import pipeline as transformers_pipeline
+                    _limit_torch_threads(threads)
+                    _sentiment_pipeline = transformers_pipeline(
+                        "sentiment-analysis",
+                        model=SENTIMENT_MODEL
+                    )
+                print("✅ Sentiment pipeline loaded.")
     return _sentiment_pipeline
 
+def has_neutral_class(pipe):
+    """Whether `pipe` can label a review NEUTRAL, as the main model can."""
+    id2label = getattr(getattr(getattr(pipe, "model", None), "config", None), "id2label", None) or {}
+    return any(str(label).upper() == "NEUTRAL" for label in id2label.values())
+
+def get_cascade_pipeline():
+    """The cheap cascade model; raises unless `CASCADE_MODEL` is a 3-class model.
+
+    A binary model (e.g. SST-2) would turn neutral reviews positive or negative,
+    so it can't keep any review and would only cost a load per worker.
+    """
+    global _cascade_pipeline
+    if _cascade_pipeline is None:
+        with _cascade_lock:
+            if _cascade_pipeline is None:
+                if not CASCADE_MODEL:
+                    raise RuntimeError("SENTIMENT_CASCADE=true needs CASCADE_MODEL set to a positive/neutral/negative model.")
+                print(f"📦 Loading cascade model {CASCADE_MODEL}...")
+                from transformers import pipeline as transformers_pipeline
+                _limit_torch_threads(INFERENCE_CPU_SHARE)
+                pipe = transformers_pipeline("sentiment-analysis", model=CASCADE_MODEL)
+                if not has_neutral_class(pipe):
+                    raise RuntimeError(f"Cascade model {CASCADE_MODEL} has no NEUTRAL class; "
+                                       f"set CASCADE_MODEL to a positive/neutral/negative model.")
+                _cascade_pipeline = pipe
+                print("✅ Cascade model loaded.")
+    return _cascade_pipeline
+
 # ---------------------
 # Core Extractors
 # ---------------------
-def extract_adjectives_and_competitors(reviews, nlp=None):
-    print("🔍 Extracting adjectives and competitor mentions...")
+def extract_review_features(reviews, nlp=None, batch_size=None, n_process=None, entities=True):
+    """Per-review `(adjectives, orgs)` lists, lowercased, in input order.
+
+    Corpora of `SPACY_MULTIPROCESS_THRESHOLD` reviews or more run on
+    `SPACY_N_PROCESS` processes unless `n_process` is given. With
+    `entities=False` NER is skipped and `orgs` stays empty.
+    """
     nlp = nlp or get_nlp()
+    if n_process is None:
+        n_process = SPACY_N_PROCESS if len(reviews) >= SPACY_MULTIPROCESS_THRESHOLD else 1
 
-    adjectives = Counter()
-    competitor_mentions = Counter()
+    features = []
+    disable = [] if entities else ["ner"]
+    for doc in nlp.pipe(reviews, batch_size=batch_size or SPACY_BATCH_SIZE, n_process=n_process, disable=disable):
+        features.append((
+            [token.text.lower() for token in doc if token.tag_ in ADJECTIVE_TAGS and token.is_alpha],
+            [ent.text.strip().lower() for ent in doc.ents if ent.label_ == "ORG"] if entities else []
+        ))
+    return features
 
-    try:
-        for doc in nlp.pipe(reviews, disable=["parser"]):
-            adjectives.update(
-                token.text.lower() for token in doc if token.pos_ == "ADJ" and token.is_alpha
-            )
-            for ent in doc.ents:
-                if ent.label_ == "ORG":
-                    key = ent.text.strip().lower()
-                    competitor_mentions[key] = competitor_mentions.get(key, 0) + 1
-    except Exception as e:
-        print(f"[ERROR] SpaCy processing failed: {e}")
-        return [], {}
+def nlp_features_id(nlp=None):
+    """Key for cached per-review features; changes with the spaCy model or its version."""
+    nlp = nlp or get_nlp()
+    return f"{nlp.meta.get('lang')}_{nlp.meta.get('name')}-{nlp.meta.get('version')}"
 
-    top_adjectives = adjectives.most_common(10)
-    top_competitors = {k: v for k, v in competitor_mentions.items() if v > 0}
-    return top_adjectives, top_competitors
+def get_openai_client():
+    """Shared OpenAI client, so its connection pool is reused across calls; None without an API key."""
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        with _openai_lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(
+                    api_key=api_key,
+                    base_url=OPENAI_BASE_URL,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=OPENAI_MAX_RETRIES
+                )
+    return _openai_client
 
 def fetch_competitor_names(product_name, manufacturer):
     print(f"🤖 GPT call for competitors: {product_name} by {manufacturer}")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    client = get_openai_client()
+    if client is None:
         print("[ERROR] OpenAI API key missing")
         return []
 
     try:
-        client = OpenAI(api_key=api_key)
 
         system_prompt = (
             "You are a product analysis assistant. Given a product name and manufacturer, "
@@ -107,18 +218,71 @@ def fetch_competitor_names(product_name, manufacturer):
         print(f"[ERROR] GPT competitor fetch failed: {e}")
         return []
 
+def fetch_competitor_names_bulk(products, client=None):
+    """GPT competitors for many `(product_name, manufacturer)` pairs in one chat completion.
+
+    The products are packed into one prompt and GPT answers with a JSON object
+    keyed by product id. Returns a list of name lists in input order (empty for
+    a product GPT skipped). Rate limits, 5xx and connection errors are raised
+    for the caller to retry; any other failure returns empty lists.
+    """
+    print(f"🤖 Bulk GPT call for competitors of {len(products)} products")
+    client = client or get_openai_client()
+    if client is None:
+        print("[ERROR] OpenAI API key missing")
+        return [[] for _ in products]
+
+    system_prompt = (
+        "You are a product analysis assistant. For each product below, list similar or competing "
+        "brands/products. Respond with a JSON object that maps every product id to a JSON list of names.\n\n"
+        "Example: {\"p1\": [\"L'Oreal\", \"Vaseline\", \"CeraVe\"], \"p2\": [\"Sony\", \"Bose\"]}"
+    )
+    product_lines = "\n".join(
+        f"p{i}: {product_name} by {manufacturer}" for i, (product_name, manufacturer) in enumerate(products, 1)
+    )
+
+    try:
+        response = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": product_lines}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.3,
+            max_tokens=min(4000, 100 + 60 * len(products))
+        )
+        raw_output = response.choices[0].message.content.strip()
+        by_id = json.loads(raw_output)
+        if not isinstance(by_id, dict):
+            print("[WARNING] Bulk GPT response not an object. Raw Output:", raw_output[:200])
+            return [[] for _ in products]
+    except (RateLimitError, InternalServerError, APIConnectionError):
+        raise
+    except Exception as e:
+        print(f"[ERROR] Bulk GPT competitor fetch failed: {e}")
+        return [[] for _ in products]
+
+    results = []
+    for i in range(1, len(products) + 1):
+        names = by_id.get(f"p{i}")
+        results.append([n.strip() for n in names if isinstance(n, str) and n.strip()] if isinstance(names, list) else [])
+    return results
+
 # ---------------------
 # Review Processing Helpers
 # ---------------------
-def compute_review_hashes_and_filter(all_reviews, existing_snapshot):
+def review_content_hash(text):
+    return hashlib.sha256(text.strip().encode()).hexdigest()
+
+def compute_review_hashes_and_filter(all_reviews, existing_snapshot, skip_hashes=None):
     reviews, review_dates, countries, review_meta = [], [], [], []
-    existing_hashes = set()
+    existing_hashes = set(skip_hashes or ())
 
     if existing_snapshot:
         try:
             for rev in json.loads(existing_snapshot.top_helpful_reviews):
-                h = hashlib.sha256(rev.get("content", "").strip().encode()).hexdigest()
-                existing_hashes.add(h)
+                existing_hashes.add(review_content_hash(rev.get("content", "")))
         except Exception as e:
             print("[WARNING] Failed to load existing hashes:", e)
 
@@ -141,7 +305,7 @@ def compute_review_hashes_and_filter(all_reviews, existing_snapshot):
         except Exception as e:
             print(f"[WARNING] Failed to parse timestamp: {timestamp} -> {e}")
 
-        content_hash = hashlib.sha256(text.encode()).hexdigest()
+        content_hash = review_content_hash(text)
         if text and content_hash not in existing_hashes:
             reviews.append(text)
             review_dates.append(formatted)
@@ -170,8 +334,8 @@ def run_startup_diagnostics():
         print(f"[ERROR] SpaCy failed to load: {e}")
 
     try:
-        sentiment_pipe = get_sentiment_pipeline()
-        result = sentiment_pipe("I love this product!")
+        from .inference import classify_sentiments
+        result = classify_sentiments(["I love this product!"])
         print(f"✅ Sentiment pipeline works: {result}")
     except Exception as e:
         print(f"[ERROR] Sentiment pipeline failed: {e}")
@@ -183,6 +347,9 @@ def run_startup_diagnostics():
         print(f"[ERROR] GPT fetch failed: {e}")
 
 def run_diagnostics_on_startup():
-    threading.Thread(target=run_startup_diagnostics).start()
+    """Opt-in (`STARTUP_DIAGNOSTICS=true`) from create_app, after models are preloaded.
 
-run_diagnostics_on_startup()
+    Not for gunicorn `--preload`: a thread still running in the master when it forks
+    would leave the workers with its locks held.
+    """
+    threading.Thread(target=run_startup_diagnostics, daemon=True).start()
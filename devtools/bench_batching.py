@@ -0,0 +1,123 @@
+"""Compare fixed-size sentiment batching with length-bucketed token-budget batching.
+
+Builds synthetic reviews from the recorded fixture texts with a long-tailed
+word-count distribution (most reviews short, a few near the 512-token cap),
+then times the old `batch_size=8` pipeline call against
+`app.inference.classify_sentiments` on the same inputs.
+
+    python devtools/bench_batching.py --reviews 500 --token-budget 8192
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers import pipeline as transformers_pipeline
+
+from app.inference import classify_sentiments, plan_batches, token_lengths
+from app.utils import SENTIMENT_MODEL
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def synthetic_reviews(n, median_words, sigma, seed):
+    with open(os.path.join(FIXTURES_DIR, "amazon_reviews.json"), encoding="utf-8") as f:
+        texts = [r["content"] for r in json.load(f)["results"][0]["content"]["reviews"]]
+    words = " ".join(texts).split()
+
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(n):
+        length = max(3, min(int(rng.lognormvariate(0, sigma) * median_words), 700))
+        start = rng.randrange(len(words))
+        reviews.append(" ".join(words[(start + i) % len(words)] for i in range(length)))
+    return reviews
+
+
+def padded_tokens(lengths, batches):
+    return sum(max(lengths[i] for i in batch) * len(batch) for batch in batches)
+
+
+def run_fixed(pipe, reviews):
+    return pipe(reviews, truncation=True, max_length=512, padding=True, batch_size=8)
+
+
+def timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentiment batching benchmark")
+    parser.add_argument("--model", default=SENTIMENT_MODEL)
+    parser.add_argument("--reviews", type=int, default=256)
+    parser.add_argument("--median-words", type=float, default=40)
+    parser.add_argument("--sigma", type=float, default=0.9, help="Log-normal spread of review lengths")
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--max-batch", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    pipe = transformers_pipeline("sentiment-analysis", model=args.model)
+    reviews = synthetic_reviews(args.reviews, args.median_words, args.sigma, args.seed)
+    lengths = token_lengths(reviews, pipe.tokenizer)
+
+    # Warm up kernels and allocator on both paths before timing
+    run_fixed(pipe, reviews[:16])
+    classify_sentiments(reviews[:16], pipe)
+
+    fixed_seconds, fixed = timed(lambda: run_fixed(pipe, reviews), args.repeat)
+    bucketed_seconds, bucketed = timed(
+        lambda: classify_sentiments(reviews, pipe, args.token_budget, args.max_batch), args.repeat
+    )
+
+    fixed_batches = [list(range(i, min(i + 8, len(reviews)))) for i in range(0, len(reviews), 8)]
+    bucketed_batches = plan_batches(lengths, args.token_budget, args.max_batch)
+    report = {
+        "model": args.model,
+        "reviews": len(reviews),
+        "real_tokens": sum(lengths),
+        "token_length_p50": sorted(lengths)[len(lengths) // 2],
+        "token_length_max": max(lengths),
+        "fixed": {
+            "seconds": round(fixed_seconds, 3),
+            "reviews_per_sec": round(len(reviews) / fixed_seconds, 1),
+            "batches": len(fixed_batches),
+            "padded_tokens": padded_tokens(lengths, fixed_batches),
+        },
+        "bucketed": {
+            "seconds": round(bucketed_seconds, 3),
+            "reviews_per_sec": round(len(reviews) / bucketed_seconds, 1),
+            "batches": len(bucketed_batches),
+            "padded_tokens": padded_tokens(lengths, bucketed_batches),
+        },
+        "speedup": round(fixed_seconds / bucketed_seconds, 2),
+        "label_agreement": sum(a["label"] == b["label"] for a, b in zip(fixed, bucketed)) / len(reviews),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"📊 {report['reviews']} reviews, {report['real_tokens']} tokens "
+          f"(p50 {report['token_length_p50']}, max {report['token_length_max']}) on {args.model}")
+    for name in ("fixed", "bucketed"):
+        r = report[name]
+        print(f"  {name:<9} {r['seconds']:>8.3f}s  {r['reviews_per_sec']:>8.1f} reviews/s  "
+              f"{r['batches']:>4} batches  {r['padded_tokens']:>8} padded tokens")
+    print(f"  speedup x{report['speedup']}, label agreement {report['label_agreement']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
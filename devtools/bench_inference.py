@@ -0,0 +1,174 @@
+"""Micro-benchmarks for the sentiment and spaCy stages.
+
+Sweeps corpus, corpus size, batch size, max_length, thread count and sentiment
+backend, and reports reviews/sec, per-batch latency (p50/p99) and peak RSS as
+JSON. Every configuration runs in a fresh subprocess so peak RSS and thread
+settings don't leak between runs; compare reports from before and after a
+tuning change or backend swap.
+
+    python devtools/bench_inference.py --stages sentiment spacy --batch-sizes 8 32 \\
+        --threads 1 4 --corpus-sizes 500 --backends torch onnx-int8 --output bench.json
+
+Corpora: `synthetic` (log-normal review lengths), `recorded` (the fixture
+reviews, cycled) or a path to a text file / JSON list of reviews.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import itertools
+import subprocess
+
+DEVTOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DEVTOOLS_DIR))
+
+
+def build_corpus(name, size, seed):
+    from bench_batching import synthetic_reviews
+    from onnx_report import load_texts
+
+    if name == "synthetic":
+        return synthetic_reviews(size, 40, 0.9, seed)
+    if name == "recorded":
+        with open(os.path.join(DEVTOOLS_DIR, "fixtures", "amazon_reviews.json"), encoding="utf-8") as f:
+            texts = [r["content"] for r in json.load(f)["results"][0]["content"]["reviews"]]
+    else:
+        texts = load_texts(name)
+    return [texts[i % len(texts)] for i in range(size)]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# ---------------------
+# One Configuration (runs in a subprocess)
+# ---------------------
+def run_one(config):
+    os.environ["SENTIMENT_BACKEND"] = config["backend"]
+    os.environ["ONNX_INTRA_OP_THREADS"] = str(config["threads"])
+    if config.get("model"):
+        os.environ["SENTIMENT_MODEL"] = config["model"]
+
+    import torch
+    torch.set_num_threads(config["threads"])
+    from app.utils import extract_review_features, get_nlp, get_sentiment_pipeline
+
+    texts = build_corpus(config["corpus"], config["corpus_size"], config["seed"])
+    batch_size = config["batch_size"]
+
+    started = time.perf_counter()
+    if config["stage"] == "sentiment":
+        # Passed explicitly: the loader otherwise caps threads at INFERENCE_CPU_SHARE
+        pipe = get_sentiment_pipeline(threads=config["threads"])
+        def run_batch(batch):
+            pipe(batch, truncation=True, max_length=config["max_length"], padding=True, batch_size=batch_size)
+    else:
+        nlp = get_nlp()
+        def run_batch(batch):
+            extract_review_features(batch, nlp, batch_size=batch_size, n_process=1)
+    load_seconds = time.perf_counter() - started
+
+    run_batch(texts[:batch_size])
+    latencies = []
+    for start in range(0, len(texts), batch_size):
+        batch_started = time.perf_counter()
+        run_batch(texts[start:start + batch_size])
+        latencies.append(time.perf_counter() - batch_started)
+
+    seconds = sum(latencies)
+    return dict(
+        config,
+        load_seconds=round(load_seconds, 3),
+        seconds=round(seconds, 3),
+        reviews_per_sec=round(len(texts) / seconds, 1),
+        batches=len(latencies),
+        batch_latency_ms={
+            "mean": round(seconds / len(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+        # ru_maxrss is in KB on Linux
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    )
+
+# ---------------------
+# Sweep
+# ---------------------
+def configurations(args):
+    for stage in args.stages:
+        if stage == "sentiment":
+            grid = itertools.product(args.backends, args.corpora, args.corpus_sizes,
+                                     args.batch_sizes, args.max_lengths, args.threads)
+        else:
+            # spaCy runs single-threaded and has no max_length or backend
+            grid = itertools.product(["-"], args.corpora, args.corpus_sizes, args.batch_sizes, [None], [1])
+        for backend, corpus, size, batch_size, max_length, threads in grid:
+            yield {
+                "stage": stage, "backend": backend, "model": args.model, "corpus": corpus,
+                "corpus_size": size, "batch_size": batch_size, "max_length": max_length,
+                "threads": threads, "seed": args.seed,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentiment + spaCy inference benchmarks")
+    parser.add_argument("--stages", nargs="+", choices=["sentiment", "spacy"], default=["sentiment", "spacy"])
+    parser.add_argument("--backends", nargs="+", default=["torch"], help="torch, onnx and/or onnx-int8")
+    parser.add_argument("--model", default=None, help="Sentiment model (default: SENTIMENT_MODEL)")
+    parser.add_argument("--corpora", nargs="+", default=["synthetic", "recorded"])
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[256])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--max-lengths", type=int, nargs="+", default=[512])
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(json.loads(args.run_one))))
+        return
+
+    import torch
+
+    runs = []
+    for config in configurations(args):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one", json.dumps(config)],
+            capture_output=True, text=True
+        )
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print(f"[ERROR] {config['stage']} run failed: {proc.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+            runs.append(dict(config, error=proc.stderr.strip()[-500:]))
+            continue
+        result = json.loads(lines[-1])
+        runs.append(result)
+        print(f"📊 {result['stage']:<9} {result['backend']:<9} {result['corpus']:<9} n={result['corpus_size']:<6} "
+              f"bs={result['batch_size']:<4} len={result['max_length']} t={result['threads']}: "
+              f"{result['reviews_per_sec']:>8.1f} reviews/s  p50 {result['batch_latency_ms']['p50']}ms  "
+              f"p99 {result['batch_latency_ms']['p99']}ms  rss {result['peak_rss_mb']}MB", file=sys.stderr)
+
+    report = {
+        "machine": {
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+        },
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Full vs slimmed spaCy pipeline for adjective + ORG extraction.
+
+`full` is the old path: every en_core_web_sm component loaded, the parser
+disabled per call, default batch size, one process. `slim` is
+`extract_review_features()` on the `get_nlp()` load (tok2vec, tagger, ner),
+with its batch size and automatic multi-process switch.
+
+    python devtools/bench_spacy.py --sizes 500 1000 5000 10000 --json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+DEVTOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DEVTOOLS_DIR))
+
+import spacy
+
+from app.utils import (
+    SPACY_BATCH_SIZE, SPACY_MULTIPROCESS_THRESHOLD, SPACY_N_PROCESS,
+    extract_review_features, get_nlp
+)
+from bench_inference import build_corpus
+
+
+def full_features(nlp, reviews):
+    return [
+        (
+            [token.text.lower() for token in doc if token.pos_ == "ADJ" and token.is_alpha],
+            [ent.text.strip().lower() for ent in doc.ents if ent.label_ == "ORG"]
+        )
+        for doc in nlp.pipe(reviews, disable=["parser"])
+    ]
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs slimmed spaCy pipeline benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 5000, 10000])
+    parser.add_argument("--corpus", default="synthetic", help="synthetic, recorded or a path to review texts")
+    parser.add_argument("--batch-size", type=int, default=SPACY_BATCH_SIZE)
+    parser.add_argument("--n-process", type=int, default=None,
+                        help=f"Force the slim process count (default: {SPACY_N_PROCESS} from "
+                             f"{SPACY_MULTIPROCESS_THRESHOLD} reviews, else 1)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    full_nlp = spacy.load("en_core_web_sm")
+    slim_nlp = get_nlp()
+    warm = build_corpus(args.corpus, 32, args.seed)
+    full_features(full_nlp, warm)
+    extract_review_features(warm, slim_nlp, n_process=1)
+
+    rows = []
+    for size in args.sizes:
+        reviews = build_corpus(args.corpus, size, args.seed)
+        n_process = args.n_process
+        if n_process is None:
+            n_process = SPACY_N_PROCESS if size >= SPACY_MULTIPROCESS_THRESHOLD else 1
+
+        full, full_seconds = timed(full_features, full_nlp, reviews)
+        slim, slim_seconds = timed(extract_review_features, reviews, slim_nlp,
+                                   batch_size=args.batch_size, n_process=n_process)
+        rows.append({
+            "reviews": size,
+            "n_process": n_process,
+            "full_seconds": round(full_seconds, 3),
+            "slim_seconds": round(slim_seconds, 3),
+            "full_reviews_per_sec": round(size / full_seconds, 1),
+            "slim_reviews_per_sec": round(size / slim_seconds, 1),
+            "speedup": round(full_seconds / slim_seconds, 2),
+            "orgs_match": sum(f[1] == s[1] for f, s in zip(full, slim)) / size,
+        })
+
+    report = {
+        "cpu_count": os.cpu_count(),
+        "full_pipes": full_nlp.pipe_names,
+        "slim_pipes": slim_nlp.pipe_names,
+        "batch_size": args.batch_size,
+        "runs": rows,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"📊 full {report['full_pipes']} vs slim {report['slim_pipes']} (batch {args.batch_size})")
+    for r in rows:
+        print(f"  n={r['reviews']:<6} procs={r['n_process']}  full {r['full_reviews_per_sec']:>8.1f}/s  "
+              f"slim {r['slim_reviews_per_sec']:>8.1f}/s  x{r['speedup']}  ORG agreement {r['orgs_match']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
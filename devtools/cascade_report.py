@@ -0,0 +1,86 @@
+"""Pick a CASCADE_THRESHOLD: escalation rate, agreement and estimated speedup per threshold.
+
+Runs the cheap cascade model and the main sentiment model once over the same
+reviews, then replays the cascade for each threshold: reviews the cheap model
+scores at or above it keep its label, the rest take the main model's. Agreement
+is measured against running the main model on everything. The app refuses a
+cascade model without a NEUTRAL class, so this one does too.
+
+    python devtools/cascade_report.py --cascade-model <3-class model> --texts reviews.txt --thresholds 0.8 0.9 0.95 0.99
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers import pipeline as transformers_pipeline
+
+from app.utils import CASCADE_MODEL, SENTIMENT_MODEL, has_neutral_class
+from onnx_report import load_texts, mapped, run
+from bench_batching import synthetic_reviews
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade threshold report")
+    parser.add_argument("--model", default=SENTIMENT_MODEL)
+    parser.add_argument("--cascade-model", default=CASCADE_MODEL or None, required=not CASCADE_MODEL)
+    parser.add_argument("--texts", help="File of review texts (one per line or a JSON list)")
+    parser.add_argument("--reviews", type=int, default=256, help="Synthetic reviews when --texts is not given")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.9, 0.95, 0.98, 0.99])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts) if args.texts else synthetic_reviews(args.reviews, 40, 0.9, args.seed)
+
+    cheap_pipe = transformers_pipeline("sentiment-analysis", model=args.cascade_model)
+    if not has_neutral_class(cheap_pipe):
+        parser.error(f"{args.cascade_model} has no NEUTRAL class; the app won't start with it as CASCADE_MODEL.")
+    main_results, main_seconds = run(transformers_pipeline("sentiment-analysis", model=args.model), texts)
+    cheap_results, cheap_seconds = run(cheap_pipe, texts)
+    main_labels = [mapped(r) for r in main_results]
+
+    rows = []
+    for threshold in args.thresholds:
+        started = time.perf_counter()
+        labels = [
+            mapped(cheap) if cheap["score"] >= threshold else main
+            for cheap, main in zip(cheap_results, main_labels)
+        ]
+        escalated = sum(cheap["score"] < threshold for cheap in cheap_results)
+        rate = escalated / len(texts)
+        estimated = cheap_seconds + rate * main_seconds + (time.perf_counter() - started)
+        rows.append({
+            "threshold": threshold,
+            "escalated": escalated,
+            "escalation_rate": round(rate, 4),
+            "label_agreement": round(sum(a == b for a, b in zip(labels, main_labels)) / len(texts), 4),
+            "estimated_seconds": round(estimated, 3),
+            "estimated_speedup": round(main_seconds / estimated, 2),
+        })
+
+    report = {
+        "model": args.model,
+        "cascade_model": args.cascade_model,
+        "reviews": len(texts),
+        "main_seconds": round(main_seconds, 3),
+        "cheap_seconds": round(cheap_seconds, 3),
+        "thresholds": rows,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"📊 {report['reviews']} reviews: {args.cascade_model} ({report['cheap_seconds']}s) "
+          f"-> {args.model} ({report['main_seconds']}s)")
+    for r in rows:
+        print(f"  threshold {r['threshold']:<5}  escalated {r['escalated']:>5} ({r['escalation_rate']:.1%})  "
+              f"agreement {r['label_agreement']:.2%}  est. x{r['estimated_speedup']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Accuracy and speed of the ONNX Runtime backends against the torch pipeline.
+
+Runs the same reviews through the transformers pipeline (baseline), the fp32
+ONNX export and the int8-quantized export, and reports label agreement, label
+flips, score deltas and throughput for each. Use real review texts with
+`--texts` (one per line, or a JSON list) when available; otherwise synthetic
+reviews are built from the fixtures.
+
+    python devtools/onnx_report.py --reviews 500 --threads 4 --json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers import pipeline as transformers_pipeline
+
+from app.analysis import LABEL_MAPPING
+from app.inference import classify_sentiments
+from app.onnx_backend import ONNX_MODEL_DIR, load_onnx_pipeline, onnx_model_path
+from app.utils import SENTIMENT_MODEL
+from bench_batching import synthetic_reviews
+
+
+def load_texts(path):
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+    try:
+        texts = json.loads(raw)
+    except ValueError:
+        texts = raw.splitlines()
+    return [t.strip() for t in texts if isinstance(t, str) and t.strip()]
+
+
+def mapped(result):
+    return LABEL_MAPPING.get(result["label"].upper(), "NEUTRAL")
+
+
+def run(pipe, texts):
+    classify_sentiments(texts[:16], pipe)
+    start = time.perf_counter()
+    results = classify_sentiments(texts, pipe)
+    return results, time.perf_counter() - start
+
+
+def compare(baseline, candidate):
+    deltas = [abs(b["score"] - c["score"]) for b, c in zip(baseline, candidate)]
+    flips = Counter(
+        f"{mapped(b)}->{mapped(c)}" for b, c in zip(baseline, candidate) if mapped(b) != mapped(c)
+    )
+    deltas.sort()
+    return {
+        "label_agreement": round(1 - sum(flips.values()) / len(baseline), 4),
+        "label_flips": dict(flips),
+        "score_delta_mean": round(sum(deltas) / len(deltas), 5),
+        "score_delta_p99": round(deltas[min(len(deltas) - 1, int(len(deltas) * 0.99))], 5),
+        "score_delta_max": round(deltas[-1], 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX backend accuracy-delta report")
+    parser.add_argument("--model", default=SENTIMENT_MODEL)
+    parser.add_argument("--texts", help="File of review texts (one per line or a JSON list)")
+    parser.add_argument("--reviews", type=int, default=256, help="Synthetic reviews when --texts is not given")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts) if args.texts else synthetic_reviews(args.reviews, 40, 0.9, args.seed)
+
+    baseline, baseline_seconds = run(transformers_pipeline("sentiment-analysis", model=args.model), texts)
+    report = {
+        "model": args.model,
+        "reviews": len(texts),
+        "baseline_label_counts": dict(Counter(mapped(r) for r in baseline)),
+        "backends": {
+            "torch": {"seconds": round(baseline_seconds, 3), "reviews_per_sec": round(len(texts) / baseline_seconds, 1)}
+        },
+    }
+
+    for name, quantize in (("onnx", False), ("onnx-int8", True)):
+        pipe = load_onnx_pipeline(args.model, quantize, args.model_dir, args.threads)
+        results, seconds = run(pipe, texts)
+        report["backends"][name] = dict(
+            compare(baseline, results),
+            seconds=round(seconds, 3),
+            reviews_per_sec=round(len(texts) / seconds, 1),
+            speedup=round(baseline_seconds / seconds, 2),
+            model_mb=round(os.path.getsize(onnx_model_path(args.model, quantize, args.model_dir)) / 1e6, 1),
+        )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"📊 {report['reviews']} reviews on {args.model}; baseline labels {report['baseline_label_counts']}")
+    for name, r in report["backends"].items():
+        line = f"  {name:<10} {r['seconds']:>8.3f}s  {r['reviews_per_sec']:>8.1f} reviews/s"
+        if name != "torch":
+            line += (f"  x{r['speedup']:<5} {r['model_mb']:>7.1f} MB  agreement {r['label_agreement']:.2%}"
+                     f"  |Δscore| mean {r['score_delta_mean']} max {r['score_delta_max']}  flips {r['label_flips']}")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
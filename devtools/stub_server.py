@@ -0,0 +1,166 @@
+"""Local stand-in for the Oxylabs realtime API and OpenAI chat completions.
+
+Replays the recorded payloads in devtools/fixtures so the pipeline can be
+load-tested and benchmarked without paid API calls. Point the app at it with:
+
+    OXYLABS_URL=http://127.0.0.1:8099/v1/queries
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1
+    OPENAI_API_KEY=stub
+
+    python devtools/stub_server.py --latency-ms 800 --jitter-ms 400 --error-rate 0.05 --pages 20
+"""
+import os
+import copy
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+
+from flask import Flask, request, jsonify
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+app = Flask(__name__)
+
+settings = {
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+    "error_rate": 0.0,
+    "pages": 10,
+    "reviews_per_page": 5,
+}
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+PRODUCT = load_fixture("amazon_product.json")
+REVIEWS = load_fixture("amazon_reviews.json")
+CHAT_COMPLETION = load_fixture("chat_completion.json")
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _simulate_upstream(kind):
+    """Sleep for the configured latency; return an error response or None."""
+    _count(f"{kind}_requests")
+    delay = settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+    if delay > 0:
+        time.sleep(delay / 1000)
+    if random.random() < settings["error_rate"]:
+        _count(f"{kind}_errors")
+        status = random.choice([429, 500, 502, 503])
+        headers = {"Retry-After": "1"} if status == 429 else {}
+        return jsonify({"message": f"Simulated upstream error {status}"}), status, headers
+    return None
+
+
+def product_response(asin):
+    data = copy.deepcopy(PRODUCT)
+    content = data["results"][0]["content"]
+    content["asin"] = asin
+    content["url"] = f"https://www.amazon.com/dp/{asin}"
+    return data
+
+
+def reviews_response(asin, page):
+    data = copy.deepcopy(REVIEWS)
+    content = data["results"][0]["content"]
+    content["asin"] = asin
+    content["page"] = page
+    content["url"] = f"https://www.amazon.com/product-reviews/{asin}?pageNumber={page}"
+
+    pool = REVIEWS["results"][0]["content"]["reviews"]
+    per_page = settings["reviews_per_page"]
+    reviews = []
+    if page <= settings["pages"]:
+        for i in range(per_page):
+            index = (page - 1) * per_page + i
+            review = copy.deepcopy(pool[index % len(pool)])
+            review["id"] = f"R{asin}{page:04d}{i:02d}"
+            # Keep recycled fixture reviews distinct so content-hash dedupe doesn't collapse them
+            cycle = index // len(pool)
+            if cycle:
+                review["content"] = f"{review['content']} (Follow-up #{cycle})"
+            reviews.append(review)
+    content["reviews"] = reviews
+    return data
+
+
+@app.route("/v1/queries", methods=["POST"])
+def queries():
+    payload = request.get_json(silent=True) or {}
+    source = payload.get("source")
+    error = _simulate_upstream(source or "oxylabs")
+    if error:
+        return error
+
+    asin = payload.get("query", "")
+    if source == "amazon_product":
+        return jsonify(product_response(asin))
+    if source == "amazon_reviews":
+        return jsonify(reviews_response(asin, int(payload.get("page", 1))))
+    return jsonify({"message": f"Unsupported source: {source}"}), 400
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    error = _simulate_upstream("chat")
+    if error:
+        return error
+
+    payload = request.get_json(silent=True) or {}
+    data = copy.deepcopy(CHAT_COMPLETION)
+    data["created"] = int(time.time())
+    data["model"] = payload.get("model", data["model"])
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        # Bulk prompt: one "p<N>: <product> by <manufacturer>" line per product
+        names = json.loads(data["choices"][0]["message"]["content"])
+        user = next((m["content"] for m in payload.get("messages", []) if m.get("role") == "user"), "")
+        ids = [line.split(":", 1)[0].strip() for line in user.splitlines() if ":" in line]
+        data["choices"][0]["message"]["content"] = json.dumps({product_id: names for product_id in ids})
+    return jsonify(data)
+
+
+@app.route("/__stats", methods=["GET"])
+def stats():
+    with _stats_lock:
+        return jsonify({"settings": settings, "counts": dict(_stats)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Oxylabs + OpenAI stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("STUB_PORT", 8099)))
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base latency added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429/5xx")
+    parser.add_argument("--pages", type=int, default=10, help="Review pages per ASIN before an empty page")
+    parser.add_argument("--reviews-per-page", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    settings.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        pages=args.pages,
+        reviews_per_page=args.reviews_per_page,
+    )
+    print(f"🧪 Stub server on http://{args.host}:{args.port} with {settings}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Gunicorn settings: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+With `preload_app` the app (and its models) is created once in the master and
+the forked workers share the weights copy-on-write. Each worker then runs a
+warmup inference pass in `post_fork`, before it starts accepting requests.
+"""
+import os
+import gc
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# HF tokenizers' Rust thread pool is not fork-safe
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def when_ready(server):
+    # Keep the preloaded objects out of GC passes so workers don't copy their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app.inference import warmup_models
+    from app.jobs import start_job_sweeper
+    from app.models import db
+    from wsgi import app
+
+    # Connections opened by create_all() in the master must not be shared
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Each worker recovers jobs itself; the master never runs them
+    start_job_sweeper(app)
+
+    if os.getenv("MODEL_WARMUP", "true").lower() == "true":
+        try:
+            warmup_models()
+        except Exception as e:
+            print(f"[ERROR] Model warmup failed in worker {worker.pid}: {e}")
@@ -10,7 +10,9 @@ import spacy.cli
 import re
 from datetime import datetime
 from collections import Counter
-import os
+
+from app.competitor_matcher import count_competitor_mentions, get_competitor_matcher
+from app.oxylabs_client import get_oxylabs_client
 
 # Download necessary NLP resources
 nltk.download('averaged_perceptron_tagger')
@@ -28,10 +30,6 @@ except OSError:
 app = Flask(__name__)
 CORS(app)  # Enable CORS
 
-# Load Oxylabs credentials from environment variables
-OXYLABS_USERNAME = os.getenv("OXYLABS_USERNAME")
-OXYLABS_PASSWORD = os.getenv("OXYLABS_PASSWORD")
-
 print("✅ Flask app initialized.")
 
 # Load lightweight sentiment model
@@ -71,27 +69,14 @@ init_db()
 
 # Fetch Amazon reviews using Oxylabs API
 def get_reviews_oxylabs(asin, pages=5, sort_by="recent"):
-    url = "https://realtime.oxylabs.io/v1/queries"
+    client = get_oxylabs_client()
     all_reviews, all_dates = [], []
+    product_name = "Unknown Product"
     for page in range(1, pages + 1):
-        payload = {
-            "source": "amazon_reviews",
-            "query": asin,
-            "page": page,
-            "pages": 1,
-            "context": [{"key": "sort_by", "value": sort_by}],
-            "geo_location": "90210",
-            "parse": True
-        }
         try:
-            response = requests.post(url, auth=(OXYLABS_USERNAME, OXYLABS_PASSWORD), json=payload)
-            data = response.json()
-            if response.status_code != 200:
-                print(f"❌ API request failed: {response.status_code}, Response: {data}")
-                continue
-            product_name = data.get("results", [{}])[0].get("content", {}).get("title", "Unknown Product")
-            reviews_data = data.get("results", [{}])[0].get("content", {}).get("reviews", [])
-            for r in reviews_data:
+            review_page = client.get_review_page(asin, page, sort_by=sort_by)
+            product_name = review_page.product_title or "Unknown Product"
+            for r in review_page.reviews:
                 content = r.get("content", "").strip()
                 timestamp = r.get("timestamp", "").strip()
                 if content and timestamp:
@@ -104,20 +89,12 @@ def get_reviews_oxylabs(asin, pages=5, sort_by="recent"):
 
 # Fetch product metadata
 def get_product_metadata(asin):
-    url = "https://realtime.oxylabs.io/v1/queries"
-    payload = {
-        "source": "amazon_product",
-        "query": asin,
-        "parse": True
-    }
     try:
-        response = requests.post(url, auth=(OXYLABS_USERNAME, OXYLABS_PASSWORD), json=payload)
-        data = response.json()
-        content = data.get("results", [{}])[0].get("content", {})
+        product = get_oxylabs_client().get_product(asin)
         return {
-            "product_name": content.get("title", "Unknown Title"),
-            "manufacturer": content.get("manufacturer", "Unknown Manufacturer"),
-            "price": content.get("price", "Unknown Price")
+            "product_name": product.title or "Unknown Title",
+            "manufacturer": product.manufacturer or "Unknown Manufacturer",
+            "price": product.price or "Unknown Price"
         }
     except Exception as e:
         print(f"❌ Metadata fetch failed: {e}")
@@ -128,6 +105,8 @@ def get_product_metadata(asin):
         }
 
 # Extract adjectives and competitors
+COMPETITOR_BRANDS = ["Nivea", "Neutrogena", "Eucerin", "Cetaphil", "CeraVe", "Aveeno", "Olay", "Lubriderm", "Dove", "Gold Bond"]
+
 def extract_adjectives_and_competitors(reviews):
     words = nltk.word_tokenize(" ".join(reviews).lower())
     tagged_words = nltk.pos_tag(words)
@@ -136,12 +115,8 @@ def extract_adjectives_and_competitors(reviews):
     adjectives = [adj for adj in adjectives if adj not in stopwords]
     top_adjectives = Counter(adjectives).most_common(10)
 
-    competitors = ["Nivea", "Neutrogena", "Eucerin", "Cetaphil", "CeraVe", "Aveeno", "Olay", "Lubriderm", "Dove", "Gold Bond"]
-    competitor_mentions = {brand.lower(): 0 for brand in competitors}
-    for word in words:
-        if word in competitor_mentions:
-            competitor_mentions[word] += 1
-    competitor_mentions = {k: v for k, v in competitor_mentions.items() if v > 0}
+    matcher = get_competitor_matcher(nlp, "run.py", brands=COMPETITOR_BRANDS)
+    competitor_mentions = count_competitor_mentions(reviews, matcher, nlp)
     return top_adjectives, competitor_mentions
 
 @app.route('/')
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Run from anywhere, like the devtools scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
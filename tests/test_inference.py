@@ -0,0 +1,47 @@
+from app.inference import classify_sentiments, plan_batches
+
+
+class FakeTokenizer:
+    def __call__(self, texts, **kwargs):
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class FakePipeline:
+    """Labels each text with itself, so results can be matched back to inputs."""
+
+    tokenizer = FakeTokenizer()
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        return [{"label": text, "score": 1.0} for text in texts]
+
+
+def test_plan_batches_covers_every_index_once():
+    lengths = [5, 1, 9, 3, 3, 7, 2, 8]
+    batches = plan_batches(lengths, token_budget=16, max_batch=3)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+
+
+def test_plan_batches_respects_budget_and_max_batch():
+    lengths = [5, 1, 9, 3, 3, 7, 2, 8]
+    batches = plan_batches(lengths, token_budget=16, max_batch=3)
+
+    for batch in batches:
+        assert len(batch) <= 3
+        if len(batch) > 1:
+            assert max(lengths[i] for i in batch) * len(batch) <= 16
+
+
+def test_classify_sentiments_preserves_input_order():
+    texts = [" ".join(["word"] * n) + f" #{i}" for i, n in enumerate([12, 1, 30, 4, 4, 20, 2, 9])]
+    pipe = FakePipeline()
+
+    results = classify_sentiments(texts, pipe, token_budget=40, max_batch=3)
+
+    # Batched out of order by length, handed back in the order given
+    assert [text for batch in pipe.batches for text in batch] != texts
+    assert [r["label"] for r in results] == texts
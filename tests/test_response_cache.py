@@ -0,0 +1,96 @@
+import os
+import types
+
+import pytest
+
+from app import response_cache
+from app.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the cache's wall clock with one the test moves by hand."""
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(response_cache, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def disk_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(directory)
+        for name in files
+        if name.endswith(".json.gz")
+    )
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path))
+    cache.set(["reviews", "B0TEST"], {"reviews": [1, 2]})
+
+    clock.now += 59
+    assert cache.get(["reviews", "B0TEST"], ttl=60) == {"reviews": [1, 2]}
+    clock.now += 2
+    assert cache.get(["reviews", "B0TEST"], ttl=60) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_stale_fallback_honours_max_stale(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path))
+    cache.set("product", {"title": "Widget"})
+    clock.now += 120
+
+    assert cache.get("product", ttl=60) is None
+    assert cache.get("product", ttl=60, allow_stale=True) == {"title": "Widget"}
+    assert cache.get("product", ttl=60, allow_stale=True, max_stale=300) == {"title": "Widget"}
+    assert cache.get("product", ttl=60, allow_stale=True, max_stale=100) is None
+    assert cache.get("missing", ttl=60, allow_stale=True) is None
+
+    stats = cache.stats()
+    # Stale lookups are a fallback after a failed fetch, not extra misses
+    assert (stats["stale_hits"], stats["misses"]) == (2, 1)
+
+
+def test_eviction_drops_least_recently_used_down_to_90_percent(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10 ** 9)
+    for i in range(10):
+        cache.set(i, os.urandom(500).hex())
+    entry_size = disk_size(tmp_path) / 10
+    # Oldest first by mtime, except entry 0, which a hit marks as recently used
+    for i in range(10):
+        os.utime(cache._path(i), (1000 + i, 1000 + i))
+    assert cache.get(0, ttl=3600) is not None
+
+    cache.max_bytes = int(entry_size * 8)
+    cache.evict()
+
+    kept = [i for i in range(10) if os.path.exists(cache._path(i))]
+    assert disk_size(tmp_path) <= cache.max_bytes * 0.9
+    assert kept == [0] + list(range(10 - len(kept) + 1, 10))
+    assert cache.stats()["evictions"] == 10 - len(kept)
+
+
+def test_store_over_budget_evicts(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=4000)
+    for i in range(20):
+        cache.set(i, os.urandom(500).hex())
+
+    assert disk_size(tmp_path) <= 4000
+    assert cache.stats()["evictions"] > 0
+
+
+def test_size_accounting_tracks_disk_usage(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.set("a", "x" * 10)
+    cache.set("b", os.urandom(500).hex())
+    assert cache.stats()["size_bytes"] == disk_size(tmp_path)
+
+    # Overwriting a key replaces its size instead of adding to it
+    cache.set("b", os.urandom(2000).hex())
+    cache.set("a", "y")
+    assert cache.stats()["size_bytes"] == disk_size(tmp_path)
+
+    # A new instance on the same directory starts from what is on disk
+    assert ResponseCache(str(tmp_path)).stats()["size_bytes"] == disk_size(tmp_path)
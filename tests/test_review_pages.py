@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from app import analysis
+from app.utils import review_content_hash
+
+
+def make_reviews(page, n=5):
+    return [{"id": f"p{page}-r{i}", "content": f"review {i} on page {page}"} for i in range(n)]
+
+
+@pytest.fixture
+def fake_pages(monkeypatch):
+    """Serve `pages[page]` from `fetch_review_page`, later pages finishing first."""
+    pages = {}
+    requested = []
+    finished = []
+    lock = threading.Lock()
+
+    def fetch_review_page(asin, page, sort_by="recent"):
+        with lock:
+            requested.append(page)
+        time.sleep(0.02 * (len(pages) - page + 1))
+        with lock:
+            finished.append(page)
+        return pages.get(page, [])
+
+    monkeypatch.setattr(analysis, "fetch_review_page", fetch_review_page)
+    return pages, requested, finished
+
+
+def test_pages_are_consumed_in_order(fake_pages):
+    pages, _, finished = fake_pages
+    pages.update({page: make_reviews(page) for page in range(1, 5)})
+
+    result = list(analysis.iter_review_pages("B0TEST", 20, fan_out=4))
+
+    assert [page for page, _ in result] == [1, 2, 3, 4]
+    assert [r for _, reviews in result for r in reviews] == [r for page in range(1, 5) for r in pages[page]]
+    assert finished != sorted(finished)
+
+
+def test_stops_at_first_empty_page(fake_pages):
+    pages, _, _ = fake_pages
+    pages.update({1: make_reviews(1), 2: make_reviews(2), 3: [], 4: make_reviews(4)})
+
+    result = list(analysis.iter_review_pages("B0TEST", 20, fan_out=4))
+
+    assert [page for page, _ in result] == [1, 2]
+
+
+def test_stops_once_count_is_collected(fake_pages):
+    pages, _, _ = fake_pages
+    pages.update({page: make_reviews(page, 10) for page in range(1, 4)})
+
+    result = list(analysis.iter_review_pages("B0TEST", 12, fan_out=3))
+
+    assert [page for page, _ in result] == [1, 2]
+    assert sum(len(reviews) for _, reviews in result) == 20
+
+
+def test_reviews_repeated_across_pages_are_dropped(fake_pages):
+    pages, _, _ = fake_pages
+    first = make_reviews(1)
+    repeated_content = {"content": " only content "}
+    pages.update({
+        1: first + [{"content": "only content"}],
+        2: [first[0], repeated_content] + make_reviews(2, 3),
+    })
+
+    result = dict(analysis.iter_review_pages("B0TEST", 10, fan_out=2))
+
+    assert result[1] == pages[1]
+    assert result[2] == make_reviews(2, 3)
+
+
+def test_incremental_window_grows_and_stops_on_known_page(fake_pages):
+    pages, requested, _ = fake_pages
+    pages.update({page: make_reviews(page) for page in range(1, 9)})
+    known = {review_content_hash(r["content"]) for r in pages[2]}
+
+    result = list(analysis.iter_review_pages("B0TEST", 40, fan_out=8, known_hashes=known))
+
+    assert [page for page, _ in result] == [1, 2]
+    # One page first, then a window of two; nothing past page 3 is ever requested
+    assert set(requested) <= {1, 2, 3}
+    assert max(requested) >= 2
+
+
+def test_without_known_hashes_the_full_fan_out_is_requested(fake_pages):
+    pages, requested, _ = fake_pages
+    pages.update({page: make_reviews(page) for page in range(1, 9)})
+
+    list(analysis.iter_review_pages("B0TEST", 40, fan_out=8))
+
+    assert sorted(requested) == list(range(1, 9))
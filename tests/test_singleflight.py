@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from app.models import db, AnalysisFlight
+from app.singleflight import coalesced
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'flights.db'}"
+    db.init_app(app)
+    with app.app_context():
+        AnalysisFlight.__table__.create(db.engine)
+    return app
+
+
+def test_concurrent_callers_share_one_run(app):
+    runs = []
+    started = threading.Event()
+
+    def compute():
+        runs.append(1)
+        started.set()
+        time.sleep(0.3)
+        yield {"event": "progress", "step": 1}
+        yield {"event": "analysis", "data": {"reviews": 3}}
+
+    results = [None] * 6
+
+    def call(i):
+        results[i] = list(coalesced(app, "asin:B0TEST", compute))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(results))]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    assert len(runs) == 1
+    for events in results:
+        assert events[-1] == {"event": "analysis", "data": {"reviews": 3}}
+
+
+def test_different_keys_run_separately(app):
+    runs = []
+
+    def compute(key):
+        def events():
+            runs.append(key)
+            yield {"event": "analysis", "data": key}
+        return events
+
+    assert list(coalesced(app, "a", compute("a")))[-1]["data"] == "a"
+    assert list(coalesced(app, "b", compute("b")))[-1]["data"] == "b"
+    assert sorted(runs) == ["a", "b"]